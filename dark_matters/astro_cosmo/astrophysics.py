@@ -128,7 +128,7 @@ def rvir_from_rho(halo_dict,cosmo):
         r_set = np.logspace(np.log10(halo_dict['scale']*1e-7),np.log10(rmax),num=100)
         rho = halo_density_builder(halo_dict)(r_set)
         return integrate(y=r_set**2*rho,x=r_set)/integrate(y=r_set**2,x=r_set)-target
-    target = cosmology.delta_c(halo_dict['z'],cosmo)*cosmology.rho_crit(halo_dict['z'],cosmo) #density contast we need
+    target = cosmology.delta_rho_c(halo_dict['z'],cosmo) #density contast we need
     return bisect(average_rho,halo_dict['scale'],halo_dict['scale']*1e6,args=(halo_dict,target))
 
 def rho_virial_int(halo_dict):
@@ -1,10 +1,24 @@
 """
 DarkMatters.astro_cosmo module for calculating cosmology dependent functions
+
+rho_crit, omega_m, delta_c, delta_rho_c, hubble_func, rvir_from_mvir and mvir_from_rvir also accept
+cosmology dictionaries whose 'omega_m', 'omega_l' and 'h' entries are arrays, these broadcast against
+z (and mass/radius) so a batch of cosmologies is evaluated in one call
 """
-from scipy.integrate import quad
-from scipy.optimize import newton
+from scipy.integrate import quad,quad_vec
+from scipy.optimize import brentq
 from scipy.integrate import simpson as integrate
+import functools
 import numpy as np
+from numpy.polynomial import chebyshev
+
+_DELTA_C_EDS = 18.0*np.pi**2 #virial density contrast for Einstein-de Sitter
+_RHO_CRIT_H2 = 2.7755e7 #critical density times H(z)^2 [Msun/Mpc^3 (km/s/Mpc)^2]
+_FOUR_PI_OVER_3 = 4.0*np.pi/3.0
+_INV_PI2 = 1.0/np.pi**2
+_DC_CHEB_ZMAX = 10.0 #upper redshift of the flat-cosmology co-moving distance fit
+_DC_CHEB_DEG = 32 #degree of that fit
+_C200_P12_PARAM = np.array([5.32e-7,-2.89237e-5,3.66e-4,1.636e-2,-1.5093,37.5153]) #c200 polynomial in ln(M h), highest power first
 
 def rho_crit(z,cosmo):
     """
@@ -22,7 +36,8 @@ def rho_crit(z,cosmo):
     rho_crit : float
         Critical density [Msun/Mpc^3]
     """
-    return 1e9*2.7755e-2/hubble_func(z,cosmo)**2
+    inv_h = hubble_func(z,cosmo)
+    return _RHO_CRIT_H2/(inv_h*inv_h)
 
 def omega_m(z,cosmo):
     """
@@ -40,7 +55,26 @@ def omega_m(z,cosmo):
     omega_m : float
         Matter fraction at z
     """
-    return 1.0/(1.0 + (1.0-cosmo['omega_m'])/cosmo['omega_m']/(1+z)**(3))
+    return _omega_m(z,cosmo['omega_m'])
+
+def _omega_m(z,w_m):
+    """
+    Matter fraction at z from the present-day matter fraction
+
+    Arguments
+    ---------------------------
+    z : float or array-like
+        Redshift
+    w_m : float or array-like
+        Matter fraction at z = 0
+
+    Returns
+    ---------------------------
+    omega_m : float or array-like
+        Matter fraction at z
+    """
+    zp1 = 1.0 + z
+    return 1.0/(1.0 + (1.0-w_m)/w_m/(zp1*zp1*zp1))
 
 def delta_c(z,cosmo):
     """
@@ -58,8 +92,44 @@ def delta_c(z,cosmo):
     delta_c : float
         Virial density contrast at z
     """
-    x = 1.0 - omega_m(z,cosmo)
-    return (18.0*np.pi**2 - 82.0*x - 39.0*x**2)#/omega_m(z,cosmo)
+    return _delta_c(z,cosmo['omega_m'])
+
+def _delta_c(z,w_m):
+    """
+    Virial density contrast at z from the present-day matter fraction
+
+    Arguments
+    ---------------------------
+    z : float or array-like
+        Redshift
+    w_m : float or array-like
+        Matter fraction at z = 0
+
+    Returns
+    ---------------------------
+    delta_c : float or array-like
+        Virial density contrast at z
+    """
+    x = 1.0 - _omega_m(z,w_m)
+    return (_DELTA_C_EDS - 82.0*x - 39.0*x*x)#/omega_m(z,cosmo)
+
+def delta_rho_c(z,cosmo):
+    """
+    Virial density threshold, delta_c*rho_crit, at z
+
+    Arguments
+    ---------------------------
+    z : float
+        Redshift
+    cosmo : dictionary
+        Cosmology parameter
+
+    Returns
+    ---------------------------
+    delta_rho_c : float
+        Mean density within the virial radius [Msun/Mpc^3]
+    """
+    return delta_c(z,cosmo)*rho_crit(z,cosmo)
 
 def rvir_from_mvir(mvir,z,cosmo):
     """
@@ -67,7 +137,7 @@ def rvir_from_mvir(mvir,z,cosmo):
 
     Arguments
     ---------------------------
-    mvir : float
+    mvir : float or array-like
         Virial mass [Msun]
     z : float
         Redshift
@@ -76,10 +146,10 @@ def rvir_from_mvir(mvir,z,cosmo):
 
     Returns
     ---------------------------
-    rvir : float
+    rvir : float or array-like
         Virial radius [Mpc]
     """
-    return (0.75*mvir/(np.pi*delta_c(z,cosmo)*rho_crit(z,cosmo)))**(1.0/3.0) #in Mpc
+    return (mvir/(_FOUR_PI_OVER_3*delta_rho_c(z,cosmo)))**(1.0/3.0) #in Mpc
 
 def mvir_from_rvir(rvir,z,cosmo):
     """
@@ -99,7 +169,65 @@ def mvir_from_rvir(rvir,z,cosmo):
     mvir : float
         Virial mass [Msun]
     """
-    return 4*np.pi/3.0*delta_c(z,cosmo)*rho_crit(z,cosmo)*rvir**3
+    return _FOUR_PI_OVER_3*delta_rho_c(z,cosmo)*rvir*rvir*rvir
+
+def z_context(z,cosmo):
+    """
+    Redshift-dependent quantities shared by the virial radius and mass conversions
+
+    Computed once per halo redshift so repeated conversions at the same z do not re-evaluate H(z)
+
+    Arguments
+    ---------------------------
+    z : float
+        Redshift
+    cosmo : dictionary
+        Cosmology parameter
+
+    Returns
+    ---------------------------
+    z_ctx : dictionary
+        Keys z, rho_crit [Msun/Mpc^3], delta_c and delta_rho_c [Msun/Mpc^3]
+    """
+    rho_c = rho_crit(z,cosmo)
+    dc = delta_c(z,cosmo)
+    return {'z':z,'rho_crit':rho_c,'delta_c':dc,'delta_rho_c':dc*rho_c}
+
+def rvir_from_ctx(mvir,z_ctx):
+    """
+    Virial radius from virial mass, using precomputed redshift quantities
+
+    Arguments
+    ---------------------------
+    mvir : float or array-like
+        Virial mass [Msun]
+    z_ctx : dictionary
+        Output of z_context at the halo redshift
+
+    Returns
+    ---------------------------
+    rvir : float or array-like
+        Virial radius [Mpc]
+    """
+    return (mvir/(_FOUR_PI_OVER_3*z_ctx['delta_rho_c']))**(1.0/3.0) #in Mpc
+
+def mvir_from_ctx(rvir,z_ctx):
+    """
+    Virial mass from virial radius, using precomputed redshift quantities
+
+    Arguments
+    ---------------------------
+    rvir : float or array-like
+        Virial radius [Mpc]
+    z_ctx : dictionary
+        Output of z_context at the halo redshift
+
+    Returns
+    ---------------------------
+    mvir : float or array-like
+        Virial mass [Msun]
+    """
+    return _FOUR_PI_OVER_3*z_ctx['delta_rho_c']*rvir*rvir*rvir
 
 def halo_scale(M,z,cosmo):
     """
@@ -107,7 +235,7 @@ def halo_scale(M,z,cosmo):
 
     Arguments
     ---------------------------
-    M : float
+    M : float or array-like
         Virial mass [Msun]
     z : float
         Redshift
@@ -116,7 +244,7 @@ def halo_scale(M,z,cosmo):
 
     Returns
     ---------------------------
-    rs : float
+    rs : float or array-like
         Scale radius [Mpc]
     """
     return rvir_from_mvir(M,z,cosmo)/cvir(M,z,cosmo)
@@ -139,7 +267,7 @@ def rho_nfw_norm_relative(cv,z,cosmo):
     rho_normRelative : float
         Rhos/rho_crit
     """
-    return delta_c(z,cosmo)/3.0*cv**3/(np.log(cv+1.0) - cv/(1.0+cv))
+    return delta_c(z,cosmo)/3.0*cv*cv*cv/(np.log(cv+1.0) - cv/(1.0+cv))
 
 def hubble_func(z,cosmo):
     """
@@ -157,9 +285,32 @@ def hubble_func(z,cosmo):
     1/H(z) : float
         Inverse Hubble parameter [(Mpc s)/km]
     """
+    return _hubble_func(z,cosmo['h'],cosmo['omega_m'],cosmo['omega_l'])
+
+def _hubble_func(z,h,w_m,w_l):
+    """
+    1/H(z) from scalar cosmology parameters
+
+    Arguments
+    ---------------------------
+    z : float or array-like
+        Redshift
+    h : float or array-like
+        Dimensionless Hubble constant
+    w_m : float or array-like
+        Matter fraction at z = 0
+    w_l : float or array-like
+        Dark energy fraction at z = 0
+
+    Returns
+    ---------------------------
+    1/H(z) : float or array-like
+        Inverse Hubble parameter [(Mpc s)/km]
+    """
     H0 = 100.0
-    w_k = 1 - cosmo['omega_m'] - cosmo['omega_l']
-    return (H0*cosmo['h']*np.sqrt(cosmo['omega_m']*(1.0+z)**3+w_k*(1+z)**2+cosmo['omega_l']))**(-1)
+    w_k = 1 - w_m - w_l
+    zp1 = 1.0 + z
+    return 1.0/(H0*h*np.sqrt((w_m*zp1 + w_k)*zp1*zp1 + w_l))
 
 def dist_co_move(z,cosmo):
     """
@@ -167,19 +318,95 @@ def dist_co_move(z,cosmo):
 
     Arguments
     ---------------------------
-    z : float
+    z : float or array-like
         Redshift
     cosmo : dictionary
         Cosmology parameter
 
     Returns
     ---------------------------
-    dcm : float
+    dcm : float or array-like
         Co-moving distance to z [Mpc]
     """
+    w_m = cosmo['omega_m']
+    w_l = cosmo['omega_l']
+    w_k = 1 - w_m - w_l
+    if w_k == 0.0 and np.all((0.0 <= np.asarray(z)) & (np.asarray(z) <= _DC_CHEB_ZMAX)):
+        #flat cosmologies use a cached Chebyshev fit of dc/ln(1+z) in ln(1+z)
+        lnz = np.log1p(z)
+        coeffs = _dist_co_move_cheb(cosmo['h'],w_m,w_l)
+        return chebyshev.chebval(2*lnz/np.log1p(_DC_CHEB_ZMAX) - 1,coeffs)*lnz
+    return transverse_distance(_dist_line_of_sight(z,cosmo),cosmo)
+
+def _dist_line_of_sight(z,cosmo):
+    """
+    Line-of-sight co-moving distance to z by direct integration
+
+    Arguments
+    ---------------------------
+    z : float or array-like
+        Redshift
+    cosmo : dictionary
+        Cosmology parameter
+
+    Returns
+    ---------------------------
+    dc : float or array-like
+        Line-of-sight co-moving distance to z [Mpc]
+    """
+    c = 2.99792458e5 #km s^-1
+    if np.ndim(z) > 0:
+        #all upper limits in one adaptive pass, int_0^z f(x) dx = z int_0^1 f(z t) dt
+        z = np.asarray(z,dtype=float)
+        return quad_vec(lambda t: z*hubble_func(z*t,cosmo),0.0,1.0)[0]*c
+    return quad(hubble_func,0,z,args=(cosmo))[0]*c
+
+@functools.lru_cache(maxsize=16)
+def _dist_co_move_cheb(h,w_m,w_l):
+    """
+    Chebyshev coefficients of dc/ln(1+z) over ln(1+z) in [0, ln(1+_DC_CHEB_ZMAX)] for a flat cosmology
+
+    Built once per (h, omega_m, omega_l) from one quad_vec pass over the Chebyshev nodes,
+    the fit reproduces the integral to ~1e-14 relative.
+
+    Arguments
+    ---------------------------
+    h : float
+        Dimensionless Hubble constant
+    w_m : float
+        Matter fraction at z = 0
+    w_l : float
+        Dark energy fraction at z = 0
+
+    Returns
+    ---------------------------
+    coeffs : array-like
+        Chebyshev series coefficients
+    """
+    cosmo = {'h':h,'omega_m':w_m,'omega_l':w_l}
+    n = _DC_CHEB_DEG + 1
+    u = np.cos(np.pi*(np.arange(n)+0.5)/n)
+    lnz = 0.5*(u+1)*np.log1p(_DC_CHEB_ZMAX)
+    return chebyshev.chebfit(u,_dist_line_of_sight(np.expm1(lnz),cosmo)/lnz,_DC_CHEB_DEG)
+
+def transverse_distance(dc,cosmo):
+    """
+    Transverse co-moving distance from line-of-sight co-moving distance
+
+    Arguments
+    ---------------------------
+    dc : float or array-like
+        Line-of-sight co-moving distance [Mpc]
+    cosmo : dictionary
+        Cosmology parameter
+
+    Returns
+    ---------------------------
+    dcm : float or array-like
+        Transverse co-moving distance [Mpc]
+    """
     c = 2.99792458e5 #km s^-1
     w_k = 1 - cosmo['omega_m'] - cosmo['omega_l']
-    dc = quad(hubble_func,0,z,args=(cosmo))[0]*c
     dh = c/(100*cosmo['h'])
     if(w_k == 0.0):
         dcm = dc
@@ -195,14 +422,14 @@ def dist_luminosity(z,cosmo):
 
     Arguments
     ---------------------------
-    z : float
+    z : float or array-like
         Redshift
     cosmo : dictionary
         Cosmology parameter
 
     Returns
     ---------------------------
-    dl : float
+    dl : float or array-like
         Luminosity distance [Mpc]
     """
     return (1.0+z)*dist_co_move(z,cosmo)
@@ -213,14 +440,14 @@ def dist_angular(z,cosmo):
 
     Arguments
     ---------------------------
-    z : float
+    z : float or array-like
         Redshift
     cosmo : dictionary
         Cosmology parameter
 
     Returns
     ---------------------------
-    da : float
+    da : float or array-like
         Angular diameter distance [Mpc]
     """
     return dist_co_move(z,cosmo)/(1.0+z)
@@ -234,7 +461,7 @@ def cvir(Mvir,z,cosmo):
 
     Arguments
     ---------------------------
-    Mvir : float
+    Mvir : float or array-like
         Virial mass [Msun]
     z : float
         Redshift
@@ -243,16 +470,17 @@ def cvir(Mvir,z,cosmo):
 
     Returns
     ---------------------------
-    cvir : float
+    cvir : float or array-like
         Virial concentration
     """
-    if cosmo['cvir_mode'] == "p12":
+    cvir_mode = cosmo['cvir_mode']
+    if cvir_mode == "p12":
         cvir_func = cvir_p12
-    elif cosmo['cvir_mode'] == "munoz_2011":
+    elif cvir_mode == "munoz_2011":
         cvir_func = cvir_munoz
-    elif cosmo['cvir_mode'] == "bullock_2001":
+    elif cvir_mode == "bullock_2001":
         cvir_func = cvir_bullock2001
-    elif cosmo['cvir_mode'] == "cpu_2006":
+    elif cvir_mode == "cpu_2006":
         cvir_func = cvir_cpu
 
     return cvir_func(Mvir,z,cosmo)
@@ -263,7 +491,7 @@ def cvir_bullock2001(M,z,cosmo):
 
     Arguments
     ---------------------------
-    M : float
+    M : float or array-like
         Virial mass [Msun]
     z : float
         Redshift
@@ -272,7 +500,7 @@ def cvir_bullock2001(M,z,cosmo):
 
     Returns
     ---------------------------
-    cvir : float
+    cvir : float or array-like
         Virial concentration
     """
     return 9.0/(1.0+z)*(M/1.3e13*cosmo['h'])**(-0.13)
@@ -283,7 +511,7 @@ def cvir_p12_param(M,z,cosmo):
 
     Arguments
     ---------------------------
-    M : float
+    M : float or array-like
         Virial mass [Msun]
     z : float
         Redshift
@@ -295,10 +523,7 @@ def cvir_p12_param(M,z,cosmo):
     cvir : float
         Virial concentration
     """
-    c = np.array([37.5153,-1.5093,1.636e-2,3.66e-4,-2.89237e-5,5.32e-7])
-    cv = 0.0
-    for i in range(0,len(c)):
-        cv += c[i]*np.log(M*cosmo['h'])**i
+    cv = np.polyval(_C200_P12_PARAM,np.log(M*cosmo['h']))
     return c200_to_cvir(cv,z,cosmo)
 
 def c200_to_cvir(c200,z,cosmo):
@@ -307,7 +532,7 @@ def c200_to_cvir(c200,z,cosmo):
 
     Arguments
     ---------------------------
-    c200 : float
+    c200 : float or array-like
         c200 concentration
     z : float
         Redshift
@@ -316,12 +541,12 @@ def c200_to_cvir(c200,z,cosmo):
 
     Returns
     ---------------------------
-    cvir : float
+    cvir : float or array-like
         Virial concentration
     """
-    dc = delta_c(z,cosmo)
-    a = -1.119*np.log10(dc) + 3.537
-    b = -0.967*np.log10(dc) + 2.181
+    log_dc = np.log10(delta_c(z,cosmo))
+    a = -1.119*log_dc + 3.537
+    b = -0.967*log_dc + 2.181
     return a*c200 + b
 
 def cvir_p12(M,z,cosmo):
@@ -330,7 +555,7 @@ def cvir_p12(M,z,cosmo):
 
     Arguments
     ---------------------------
-    M : float
+    M : float or array-like
         Virial mass [Msun]
     z : float
         Redshift
@@ -339,77 +564,78 @@ def cvir_p12(M,z,cosmo):
 
     Returns
     ---------------------------
-    cvir : float
+    cvir : float or array-like
         Virial concentration
     """
-    def sigma_param(M,z,cosmo):
-        """
-        Overdensity sigma from Sanchez-Conde & Prada 2013
+    a = 1.0/(1+z)
+    x = (cosmo['omega_l']/cosmo['omega_m'])**(1.0/3)*a
+    y = x/a #this ensures b1 and b0 are unity at z = 0
+    b0 = _cmin_p12(x,y)
+    b1 = _smin_p12(x,y)
+    sigma_p = b1*_sigma_p12(M,z,cosmo)
+    A = 2.881;b=1.257;c=1.022;d=0.060
+    csig = A*((sigma_p/b)**c + 1)*np.exp(d/sigma_p**2)
+    c200 = b0*csig
+    return c200_to_cvir(c200,z,cosmo)
 
-        Arguments
-        ---------------------------
-        M : float
-            Virial mass [Msun]
-        z : float
-            Redshift
-        cosmo : dictionary
-            Cosmology parameter
+def _sigma_p12(M,z,cosmo):
+    """
+    Overdensity sigma from Sanchez-Conde & Prada 2013
 
-        Returns
-        ---------------------------
-        sigma : float
-            Relative mass overdensity
-        """
-        y = (M*cosmo['h']/1.0e12)**(-1)
-        return glinear(z,cosmo)*16.9*y**(0.41)/(1+1.102*y**(0.2)+6.22*y**(0.333))
+    Arguments
+    ---------------------------
+    M : float or array-like
+        Virial mass [Msun]
+    z : float
+        Redshift
+    cosmo : dictionary
+        Cosmology parameter
 
-    def smin(x,y):
-        """
-        Smin function from Sanchez-Conde & Prada 2013
+    Returns
+    ---------------------------
+    sigma : float or array-like
+        Relative mass overdensity
+    """
+    y = (M*cosmo['h']/1.0e12)**(-1)
+    return glinear(z,cosmo)*16.9*y**(0.41)/(1+1.102*y**(0.2)+6.22*y**(0.333))
 
-        Arguments
-        ---------------------------
-        x : float
-            Scale-factor at ML equality times a(z)
-        y : float
-            Scale-factor at ML equality
+def _smin_p12(x,y):
+    """
+    Smin function from Sanchez-Conde & Prada 2013
 
-        Returns
-        ---------------------------
-        Smin : float
-            Fitting ratio for cvir_p12
-        """
-        s0 = 1.047;s1 = 1.646;beta = 7.386;x1 = 0.526 #fitting parameters
-        return (s0 + (s1-s0)*(np.arctan(beta*(x-x1))/np.pi+0.5))/(s0 + (s1-s0)*(np.arctan(beta*(y-x1))/np.pi+0.5))
+    Arguments
+    ---------------------------
+    x : float
+        Scale-factor at ML equality times a(z)
+    y : float
+        Scale-factor at ML equality
 
-    def cmin(x,y):
-        """
-        Cmin function from Sanchez-Conde & Prada 2013
+    Returns
+    ---------------------------
+    Smin : float
+        Fitting ratio for cvir_p12
+    """
+    s0 = 1.047;s1 = 1.646;beta = 7.386;x1 = 0.526 #fitting parameters
+    return (s0 + (s1-s0)*(np.arctan(beta*(x-x1))/np.pi+0.5))/(s0 + (s1-s0)*(np.arctan(beta*(y-x1))/np.pi+0.5))
 
-        Arguments
-        ---------------------------
-        x : float
-            Scale-factor at ML equality times a(z)
-        y : float
-            Scale-factor at ML equality
+def _cmin_p12(x,y):
+    """
+    Cmin function from Sanchez-Conde & Prada 2013
 
-        Returns
-        ---------------------------
-        Cmin : float
-            Fitting ratio for cvir_p12
-        """
-        c0 = 3.681;c1 = 5.033;alpha = 6.948;x0 = 0.424 #fitting parameters
-        return (c0 + (c1-c0)*(np.arctan(alpha*(x-x0))/np.pi+0.5))/(c0 + (c1-c0)*(np.arctan(alpha*(y-x0))/np.pi+0.5))
-    a = 1.0/(1+z)
-    x = (cosmo['omega_l']/cosmo['omega_m'])**(1.0/3)*a
-    y = x/a #this ensures b1 and b0 are unity at z = 0
-    b0 = cmin(x,y)
-    b1 = smin(x,y)
-    sigma_p = b1*sigma_param(M,z,cosmo)
-    A = 2.881;b=1.257;c=1.022;d=0.060
-    csig = A*((sigma_p/b)**c + 1)*np.exp(d/sigma_p**2)
-    c200 = b0*csig
-    return c200_to_cvir(c200,z,cosmo)
+    Arguments
+    ---------------------------
+    x : float
+        Scale-factor at ML equality times a(z)
+    y : float
+        Scale-factor at ML equality
+
+    Returns
+    ---------------------------
+    Cmin : float
+        Fitting ratio for cvir_p12
+    """
+    c0 = 3.681;c1 = 5.033;alpha = 6.948;x0 = 0.424 #fitting parameters
+    return (c0 + (c1-c0)*(np.arctan(alpha*(x-x0))/np.pi+0.5))/(c0 + (c1-c0)*(np.arctan(alpha*(y-x0))/np.pi+0.5))
 
 def cvir_cpu(Mvir,z,cosmo):
     """
@@ -417,7 +643,7 @@ def cvir_cpu(Mvir,z,cosmo):
 
     Arguments
     ---------------------------
-    Mvir : float
+    Mvir : float or array-like
         Virial mass [Msun]
     z : float
         Redshift
@@ -426,21 +652,121 @@ def cvir_cpu(Mvir,z,cosmo):
 
     Returns
     ---------------------------
-    cvir : float
+    cvir : float or array-like
         Virial concentration
     """
-    def find_zc(z,Mvir,cosmo):
-        m = Mvir*0.015
-        r8 = 8/cosmo['h']
-        z0 = 0.0
-        rcut = (3*1.0e-6/(4*np.pi*omega_m(z0,cosmo)*rho_crit(z0,cosmo)))**(1.0/3)
-        r = (3*m/(4*np.pi*omega_m(z0,cosmo)*rho_crit(z0,cosmo)))**(1.0/3)
-        sig8 = sigma_l(r8,0,rcut,rcut,z0,cosmo)/0.897**2
-        sig = np.sqrt(sigma_l(r,0,rcut,rcut,z0,cosmo)/sig8)
-        return glinear(z,cosmo)*sig - 1.686
+    w_m = cosmo['omega_m']
+    zc = collapse_redshift(Mvir,cosmo)
+    return (_delta_c(zc,w_m)*_omega_m(z,w_m)/_delta_c(z,w_m)/_omega_m(zc,w_m))**(1.0/3)*(1+zc)/(1+z)
+
+@functools.lru_cache(maxsize=16)
+def _sigma8_norm(h,w_m,w_l):
+    """
+    sigma_l at 8/h Mpc, normalised to sigma_8 = 0.897, for collapse_redshift
+
+    Depends only on the cosmology, so it is computed once per (h, omega_m, omega_l) per process.
+
+    Arguments
+    ---------------------------
+    h : float
+        Dimensionless Hubble constant
+    w_m : float
+        Matter fraction at z = 0
+    w_l : float
+        Dark energy fraction at z = 0
+
+    Returns
+    ---------------------------
+    sig8 : float
+        sigma_l(8/h Mpc)/0.897^2
+    """
+    cosmo = {'h':h,'omega_m':w_m,'omega_l':w_l}
+    z0 = 0.0
+    rho_m0 = omega_m(z0,cosmo)*rho_crit(z0,cosmo)
+    rcut = (1.0e-6/(_FOUR_PI_OVER_3*rho_m0))**(1.0/3)
+    return sigma_l(8/h,0,rcut,rcut,z0,cosmo)/0.897**2
+
+@functools.lru_cache(maxsize=16)
+def _glinear_inverse_table(w_m,w_l,z_lo,z_hi,n=1024):
+    """
+    Table of ln(g) and its slope on a uniform ln(1+z) grid, for inverting the growth function
+
+    Arguments
+    ---------------------------
+    w_m : float
+        Matter fraction at z = 0
+    w_l : float
+        Dark energy fraction at z = 0
+    z_lo : float
+        Lowest tabulated redshift
+    z_hi : float
+        Highest tabulated redshift
+    n : int, optional
+        Number of table points
+
+    Returns
+    ---------------------------
+    lnz_set : array-like
+        ln(1+z) grid
+    lng_set : array-like
+        ln(g) at each grid point
+    dlng_set : array-like
+        d ln(g)/d ln(1+z) at each grid point
+    """
+    lnz_set = np.linspace(np.log1p(z_lo),np.log1p(z_hi),num=n)
+    lng_set = np.log(_glinear_func(w_m,w_l)(np.expm1(lnz_set)))
+    return lnz_set,lng_set,np.gradient(lng_set,lnz_set)
+
+def collapse_redshift(Mvir,cosmo):
+    """
+    Halo collapse redshift from Colafrancesco, Profumo, & Ullio 2006
+
+    The collapse redshift is searched for in [-0.5, 100], a ValueError is raised if it lies outside this
+    range for any of the masses (e.g. above ~2.5e15 Msun for Planck-like cosmologies, where it would be below -0.5)
 
-    zc = newton(find_zc,1,args=(Mvir,cosmo))
-    return (delta_c(zc,cosmo)*omega_m(z,cosmo)/delta_c(z,cosmo)/omega_m(zc,cosmo))**(1.0/3)*(1+zc)/(1+z)
+    Arguments
+    ---------------------------
+    Mvir : float or array-like
+        Virial mass [Msun]
+    cosmo : dictionary
+        Cosmology parameter
+
+    Returns
+    ---------------------------
+    zc : float or array-like
+        Collapse redshift, same shape as Mvir
+    """
+    def find_zc(z,sig,g):
+        return g(z)*sig - 1.686
+
+    w_m = cosmo['omega_m']
+    w_l = cosmo['omega_l']
+    m = np.asarray(Mvir,dtype=float)*0.015
+    z0 = 0.0
+    rho_m0 = omega_m(z0,cosmo)*rho_crit(z0,cosmo)
+    rcut = (1.0e-6/(_FOUR_PI_OVER_3*rho_m0))**(1.0/3)
+    r = (m/(_FOUR_PI_OVER_3*rho_m0))**(1.0/3)
+    #sigma does not depend on the collapse redshift, so all radii are integrated once in a single call
+    sig = np.sqrt(sigma_l(r.ravel(),0,rcut,rcut,z0,cosmo)/_sigma8_norm(cosmo['h'],w_m,w_l))
+    #growth function is monotonic in z, so there is at most one root, bracketed if find_zc changes sign over [z_lo,z_hi]
+    #(zc < 0 for the most massive halos)
+    g = _glinear_func(w_m,w_l)
+    z_lo = -0.5
+    z_hi = 100.0
+    no_root = find_zc(z_lo,sig,g)*find_zc(z_hi,sig,g) > 0.0
+    if np.any(no_root):
+        raise ValueError(f"No collapse redshift in [{z_lo},{z_hi}] for Mvir = {np.array2string(m.ravel()[no_root]/0.015,precision=4)} Msun")
+    if sig.size == 1:
+        zc = brentq(find_zc,z_lo,z_hi,args=(sig[0],g))
+    else:
+        #invert a tabulated ln(g) against ln(1+z) for all masses at once, then polish with two Newton steps
+        lnz_set,lng_set,dlng_set = _glinear_inverse_table(w_m,w_l,z_lo,z_hi)
+        lng_c = np.log(1.686/sig)
+        x = np.interp(-lng_c,-lng_set,lnz_set) #ln(g) decreases with z
+        for i in range(2):
+            x -= (np.log(g(np.expm1(x))) - lng_c)/np.interp(x,lnz_set,dlng_set)
+        zc = np.expm1(x)
+    return np.reshape(zc,m.shape)[()]
 
 def cvir_munoz(Mvir,z,cosmo):
     """
@@ -448,7 +774,7 @@ def cvir_munoz(Mvir,z,cosmo):
 
     Arguments
     ---------------------------
-    Mvir : float
+    Mvir : float or array-like
         Virial mass [Msun]
     z : float
         Redshift
@@ -457,7 +783,7 @@ def cvir_munoz(Mvir,z,cosmo):
 
     Returns
     ---------------------------
-    cvir : float
+    cvir : float or array-like
         Virial concentration
     """
     w = 0.029
@@ -476,7 +802,7 @@ def sigma_l(r,l,rc,rmin,z,cosmo):
 
     Arguments
     ---------------------------
-    r : float
+    r : float or array-like
         Radius of sphere [Mpc]
     l : integer
         Distribution moment
@@ -491,8 +817,8 @@ def sigma_l(r,l,rc,rmin,z,cosmo):
 
     Returns
     ---------------------------
-    sigma_l : float
-        Average relative excess mass in radius r
+    sigma_l : float or array-like
+        Average relative excess mass in radius r, same shape as r
     """
     def pspec(k,z,cosmo):
         """
@@ -512,8 +838,15 @@ def sigma_l(r,l,rc,rmin,z,cosmo):
         dl : float
             Luminosity distance [Mpc]
         """
-        q = k/(omega_m(z,cosmo)*cosmo['h']**2)
-        return k*(np.log(1+2.34*q)/(2.34*q)/(1 + 3.89*q + (16.1*q)**2 + (5.46*q)**3+(6.71*q)**4)**0.25)**2
+        h = cosmo['h']
+        q = k/(omega_m(z,cosmo)*h*h)
+        a = 16.1*q
+        b = 5.46*q
+        c = 6.71*q
+        c *= c
+        #transfer function enters squared, so its quartic root becomes a square root
+        t = np.log(1+2.34*q)/(2.34*q)
+        return k*t*t/np.sqrt(1 + 3.89*q + a*a + b*b*b + c*c)
 
     def window(x):
         """
@@ -529,16 +862,24 @@ def sigma_l(r,l,rc,rmin,z,cosmo):
         window : float
             Fourier transform of top-hat function
         """
-        return 3*(np.sin(x) - x*np.cos(x))/x**3
+        #the direct form cancels catastrophically as x -> 0, use the series there instead
+        x = np.asarray(x)
+        small = np.abs(x) < 1e-2
+        xs = np.where(small,1.0,x)
+        x2 = x*x
+        return np.where(small,1.0 - x2/10.0 + x2*x2/280.0,3*(np.sin(xs) - xs*np.cos(xs))/(xs*xs*xs))
     n = 101
     kmax = 1.0/rmin
     kcut = 1.0/rc
     kmin = 1.0e-8*kmax
-    kset = np.zeros(n,dtype=float)
-    kint = np.zeros(n,dtype=float)
+    r = np.asarray(r,dtype=float)
     kset = np.logspace(np.log10(kmin),np.log10(kmax),num=n)
-    kint = 0.5*kset**(2*(1+l))*pspec(kset,z,cosmo)*window(kset*r)**2*np.exp(-kset/kcut)/np.pi**2
-    return integrate(y=kint,x=kset)
+    #r-independent part of the integrand is evaluated once, radii are broadcast along trailing axes
+    #integrated over ln(k) on the log-spaced grid, dk = k dln(k) gives the extra power of k
+    kfac = 0.5*_INV_PI2*kset**(2*(1+l)+1)*pspec(kset,z,cosmo)*np.exp(-kset/kcut)
+    w = window(np.multiply.outer(kset,r))
+    kint = kfac.reshape((n,)+(1,)*r.ndim)*w*w
+    return integrate(y=kint,x=np.log(kset),axis=0)
 
 def glinear(z,cosmo):
     """
@@ -556,23 +897,71 @@ def glinear(z,cosmo):
     glinear : float
         Growth function g(z)
     """
-    g = 1.0
-    if(cosmo['omega_l'] == 0.0 and cosmo['omega_m'] == 1.0):
-        g = (1+z)**(-1)
-    elif(cosmo['omega_m'] < 1.0 and cosmo['omega_l'] == 0.0):
-        x0 = (1.0/cosmo['omega_m'] - 1)
-        x = x0/(1+z)
-        Ax = 1 + 3/x + 3*np.sqrt(1+x)/x**1.5*np.log(np.sqrt(1+x)-np.sqrt(x))
-        Ax0 = 1 + 3/x0 + 3*np.sqrt(1+x0)/x0**1.5*np.log(np.sqrt(1+x0)-np.sqrt(x0))
-        g = Ax/Ax0
-    elif(cosmo['omega_l'] > 0 and cosmo['omega_l'] == 1.0 - cosmo['omega_m']):
-        om = omega_m(z,cosmo)
-        om0 = omega_m(0.0,cosmo)
-        ol = 1.0 - om
+    return _glinear(z,cosmo['omega_m'],cosmo['omega_l'])
+
+def _glinear(z,w_m,w_l):
+    """
+    Linear growth function at z from scalar cosmology parameters
+
+    Arguments
+    ---------------------------
+    z : float
+        Redshift
+    w_m : float
+        Matter fraction at z = 0
+    w_l : float
+        Dark energy fraction at z = 0
+
+    Returns
+    ---------------------------
+    glinear : float
+        Growth function g(z)
+    """
+    return _glinear_func(w_m,w_l)(z)
+
+@functools.lru_cache(maxsize=16)
+def _glinear_func(w_m,w_l):
+    """
+    Linear growth function for one cosmology
+
+    The regime and the z = 0 normalisation are fixed once per (omega_m, omega_l), so root finds
+    over z only evaluate the z-dependent part.
+
+    Arguments
+    ---------------------------
+    w_m : float
+        Matter fraction at z = 0
+    w_l : float
+        Dark energy fraction at z = 0
+
+    Returns
+    ---------------------------
+    g(z) : function
+        Growth function of redshift
+    """
+    if(w_l == 0.0 and w_m == 1.0):
+        def g(z):
+            return 1.0/(1+z)
+    elif(w_m < 1.0 and w_l == 0.0):
+        x0 = (1.0/w_m - 1)
+        sx0 = np.sqrt(x0)
+        sx01 = np.sqrt(1+x0)
+        Ax0 = 1 + 3/x0 + 3*sx01/(x0*sx0)*np.log(sx01-sx0)
+        def g(z):
+            x = x0/(1+z)
+            sx = np.sqrt(x)
+            sx1 = np.sqrt(1+x)
+            Ax = 1 + 3/x + 3*sx1/(x*sx)*np.log(sx1-sx)
+            return Ax/Ax0
+    elif(w_l > 0 and w_l == 1.0 - w_m):
+        om0 = _omega_m(0.0,w_m)
         ol0 = 1.0 - om0
         #this approximation very closely matches true expression commented out below
-        N = 2.5*om0*(om0**(4.0/7) - ol0 + (1 + 0.5*om0)*(1 + 1.0/70*ol0))**(-1)
-        g = 2.5*om*(om**(4.0/7) - ol + (1 + 0.5*om)*(1 + 1.0/70*ol))**(-1)/(1 + z)/N
+        N = 2.5*om0/(om0**(4.0/7) - ol0 + (1 + 0.5*om0)*(1 + 1.0/70*ol0))
+        def g(z):
+            om = _omega_m(z,w_m)
+            ol = 1.0 - om
+            return 2.5*om/(om**(4.0/7) - ol + (1 + 0.5*om)*(1 + 1.0/70*ol))/(1 + z)/N
         #x0 = (2*(1.0/w_m - 1))**(1.0/3)
         #x = x0/(1+z)
         #xset = linspace(0,x,num=101)
@@ -582,4 +971,7 @@ def glinear(z,cosmo):
         #Ax = np.sqrt(x**3 + 2)/x**1.5*integrate(aset,xset)
         #Ax0 = np.sqrt(x0**3 + 2)/x0**1.5*integrate(a0set,x0set)
         #ga = Ax/Ax0
+    else:
+        def g(z):
+            return np.ones_like(z,dtype=float)
     return g
\ No newline at end of file
@@ -208,7 +208,7 @@ def calc_electrons(mx,calc_data,halo_data,part_data,mag_data,gas_data,diff_data,
             dBdr_sample = np.gradient(mag_data['mag_field_func'](r_sample),r_sample)
         if np.isscalar(dBdr_sample):
             dBdr_sample = dBdr_sample*np.ones_like(r_sample)
-        os_solver = os_electron.os_scheme(benchmark_flag=calc_data['os_bench_mark_mode'],const_delta_t=calc_data['os_delta_t_constant'])
+        os_solver = os_electron.os_scheme(benchmark_flag=calc_data['os_bench_mark_mode'],const_delta_t=calc_data['os_delta_t_constant'],single_precision=calc_data['os_single_precision'])
         calc_data['results']['electron_data'][m_index] = os_solver.solve_electrons(mx,halo_data['z'],E_set,r_sample,rho_dm_sample,Q_set,b_sample,dBdr_sample,ne_sample,halo_data['scale'],1.0,diff_data['diff_index'],u_ph=diff_data['photon_density'],diff0=diff_data['diff_constant'],delta_t_min=calc_data['os_delta_t_min'],loss_only=diff_data['loss_only'],mode_exp=mode_exp,delta_ti=calc_data['os_delta_ti'],max_t_part=calc_data['os_max_steps'],delta_t_reduction=calc_data['os_delta_t_reduction'],f_tol=calc_data['os_final_tolerance'],i_tol=calc_data['os_internal_tolerance'])*(constants.m_e*constants.c**2).to("GeV").value
     print("Process Complete")
     return calc_data
@@ -1,15 +1,163 @@
 """
 DarkMatters module for checking input dictionaries are usuable 
 """
-import os,yaml
+import os,sys,functools,pickle,yaml
 import numpy as np
-from astropy import constants
 from genericpath import isdir
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
 
-from .input import get_spectral_data
+from .input import get_spectral_data as _raw_get_spectral_data
 from .output import fatal_error,warning
 from .astro_cosmo import astrophysics,cosmology
 
+_MISSING = object() #sentinel for single-lookup dict.get() probes
+_M_E_GEV = None #electron rest energy [GeV], set on first use by _m_e_gev()
+_ALL_ELECTRON_MODES = frozenset({"os-python","green-python","green-c"})
+_ALL_MODES = frozenset({"jflux","flux","sb"})
+_ALL_FREQS = frozenset({"radio","all","gamma","pgamma","sgamma","neutrinos_e","neutrinos_mu","neutrinos_tau"})
+_JFLUX_FREQS = frozenset({"pgamma","neutrinos_mu","neutrinos_e","neutrinos_tau"})
+_CVIR_MODES = frozenset({'p12','munoz_2011','bullock_2001','cpu_2006'})
+_ANN_DECAY = frozenset({"annihilation","decay"})
+_GREEN_ONLY = frozenset({"r_green_sample_num","e_green_sample_num","thread_number","image_number"})
+_OS_ONLY = frozenset({"os_delta_t_reduction","os_delta_ti","os_max_steps","os_delta_t_constant","os_bench_mark_mode","os_delta_t_min","os_final_tolerance","os_internal_tolerance","os_single_precision"})
+_FREQ_TO_SPECSET = { #particle yield spectra needed for each freq_mode
+    "neutrinos_e":("neutrinos_e",),
+    "neutrinos_mu":("neutrinos_mu",),
+    "neutrinos_tau":("neutrinos_tau",),
+    "gamma":("gammas","positrons"),
+    "pgamma":("gammas",),
+    "sgamma":("gammas","positrons"),
+    "all":("gammas","positrons"),
+    "radio":("positrons",),
+}
+_VAR_SET1 = ("rho_norm","mvir","rvir","rho_norm_relative") #halo normalisation variables
+_VAR_SET2 = ("cvir","scale") #halo scale variables
+_MODULE_DIR = os.path.dirname(os.path.realpath(__file__))
+_CONFIG_DIR = os.path.join(_MODULE_DIR,"config")
+_EMISSIONS_DIR = os.path.join(_MODULE_DIR,"emissions")
+_PART_DIR = os.path.join(_MODULE_DIR,"particle_physics")
+
+def _load_profiles(yaml_path):
+    """
+    Reads a profile specification file
+
+    The parsed content is pickled next to the yaml file (yaml_path + ".cache.pkl") together
+    with the yaml modification time, so later imports skip the yaml parse unless the file
+    has changed. Read-only installs simply parse the yaml every time.
+
+    Arguments
+    ---------------------------
+    yaml_path : str
+        Path to the yaml file
+
+    Returns
+    ---------------------------
+    profiles : dictionary
+        Required variables for each profile, as tuples of interned strings
+    """
+    cache_path = yaml_path + ".cache.pkl"
+    yaml_mtime = os.path.getmtime(yaml_path)
+    raw = None
+    try:
+        with open(cache_path,"rb") as in_file:
+            cache_mtime,cache_raw = pickle.load(in_file)
+        if cache_mtime == yaml_mtime:
+            raw = cache_raw
+    except (OSError,EOFError,ValueError,TypeError,pickle.UnpicklingError):
+        pass
+    if raw is None:
+        with open(yaml_path,"r") as in_file:
+            raw = yaml.load(in_file,Loader=_YamlLoader)
+        if os.access(os.path.dirname(yaml_path),os.W_OK):
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path,"wb") as out_file:
+                    pickle.dump((yaml_mtime,raw),out_file)
+                os.replace(tmp_path,cache_path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    return {k: tuple(sys.intern(v) for v in vs) for k, vs in raw.items()}
+
+#static profile specifications, parsed once at import
+_MAG_PROFILES = _load_profiles(os.path.join(_CONFIG_DIR,"mag_field_profiles.yaml"))
+_HALO_PROFILES = _load_profiles(os.path.join(_CONFIG_DIR,"halo_density_profiles.yaml"))
+_GAS_PROFILES = _load_profiles(os.path.join(_CONFIG_DIR,"gas_density_profiles.yaml"))
+
+def _m_e_gev():
+    """
+    Electron rest energy, astropy constants are only imported and converted on first use
+
+    Returns
+    ---------------------------
+    m_e : float
+        Electron rest energy [GeV]
+    """
+    global _M_E_GEV
+    if _M_E_GEV is None:
+        from astropy import constants
+        _M_E_GEV = (constants.m_e*constants.c**2).to("GeV").value
+    return _M_E_GEV
+
+def _require_dict_args(*names):
+    """
+    Decorator that exits with an error unless the named arguments of a check function are dictionaries
+
+    Arguments
+    ---------------------------
+    names : str
+        Names of the leading positional arguments to check, in order
+
+    Returns
+    ---------------------------
+    deco : function
+        Decorator applying the checks
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args,**kwargs):
+            for i,nm in enumerate(names):
+                arg = args[i] if i < len(args) else kwargs.get(nm)
+                if not isinstance(arg,dict):
+                    fatal_error(f"dictionary_checks.{fn.__name__}() must be passed a dictionary for {nm}")
+            return fn(*args,**kwargs)
+        return wrapper
+    return deco
+
+@functools.lru_cache(maxsize=64)
+def _spectral_data(spectrum_directory,part_model,spec_set,em_model):
+    return _raw_get_spectral_data(spectrum_directory,part_model,list(spec_set),mode=em_model)
+
+def _cached_get_spectral_data(spectrum_directory,part_model,spec_set,em_model):
+    """
+    Memoised wrapper around input.get_spectral_data
+
+    Spectrum files are read once per (spectrum_directory, part_model, spec_set, em_model)
+    per process. If the files in a spectrum directory are changed during a session, call
+    _spectral_data.cache_clear() to force them to be re-read.
+
+    Arguments
+    ---------------------------
+    spectrum_directory : str
+        Path of folder where spectra are stored
+    part_model : str
+        Label of particle physics model
+    spec_set : tuple
+        Particle yield spectra to be loaded
+    em_model : str
+        Annihilation or decay
+
+    Returns
+    ---------------------------
+    spec_dict : dictionary
+        Dictionary of yield spectra, a fresh copy so callers can modify it safely
+    """
+    return dict(_spectral_data(spectrum_directory,part_model,spec_set,em_model))
+
+@_require_dict_args('cosmo_dict')
 def check_cosmology(cosmo_dict):
     """
     Checks the properties of a cosmology dictionary
@@ -24,24 +172,20 @@ def check_cosmology(cosmo_dict):
     cosmo_dict : dictionary
         Cosmology information in compliance with DarkMatters requirements, code will exit if this cannot be achieved
     """
-    if not type(cosmo_dict) is dict:
-        fatal_error("dictionary_checks.check_cosmology() must be passed a dictionary as its argument")
-    if not 'omega_m' in cosmo_dict.keys() and not 'omega_l' in cosmo_dict.keys():
+    if 'omega_m' not in cosmo_dict and 'omega_l' not in cosmo_dict:
         cosmo_dict['omega_m'] = 0.3089
         cosmo_dict['omega_l'] = 1 - cosmo_dict['omega_m']
-    elif not 'omega_m' in cosmo_dict.keys():
+    elif 'omega_m' not in cosmo_dict:
         cosmo_dict['omega_m'] = 1 - cosmo_dict['omega_l']
-    elif not 'omega_l' in cosmo_dict.keys():
+    elif 'omega_l' not in cosmo_dict:
         cosmo_dict['omega_l'] = 1 - cosmo_dict['omega_m']
-    if not 'cvir_mode' in cosmo_dict.keys():
-        cosmo_dict['cvir_mode'] = 'p12'
-    cvir_modes = ['p12','munoz_2011','bullock_2001','cpu_2006']
-    if not cosmo_dict['cvir_mode'] in cvir_modes:
-        fatal_error(f"cosmo_data['cvir_mode'] = {cosmo_dict['cvir_mode']} is not valid, use one of {cvir_modes}")
-    if not 'h' in cosmo_dict.keys():
-        cosmo_dict['h'] = 0.6774
+    cosmo_dict.setdefault('cvir_mode','p12')
+    if cosmo_dict['cvir_mode'] not in _CVIR_MODES:
+        fatal_error(f"cosmo_data['cvir_mode'] = {cosmo_dict['cvir_mode']} is not valid, use one of {sorted(_CVIR_MODES)}")
+    cosmo_dict.setdefault('h',0.6774)
     return cosmo_dict
 
+@_require_dict_args('mag_dict')
 def check_magnetic(mag_dict):
     """
     Checks the properties of a magnetic field dictionary
@@ -56,21 +200,14 @@ def check_magnetic(mag_dict):
     mag_dict : dictionary
         Magnetic Field information in compliance with DarkMatters requirements, code will exit if this cannot be achieved
     """
-    if not type(mag_dict) is dict:
-        fatal_error("dictionary_checks.check_magnetic() must be passed a dictionary as its argument")
-    in_file = open(os.path.join(os.path.dirname(os.path.realpath(__file__)),"config/mag_field_profiles.yaml"),"r")
-    profile_dict = yaml.load(in_file,Loader=yaml.SafeLoader)
-    in_file.close()
-    if 'mag_field_func' in mag_dict.keys() and mag_dict['mag_func_lock']: #No functionality implemented yet
+    if 'mag_field_func' in mag_dict and mag_dict['mag_func_lock']: #No functionality implemented yet
         mag_dict['profile'] = "custom"
         return mag_dict
-    if not 'profile' in mag_dict.keys():
-        mag_dict['profile'] = "flat"
-    if not mag_dict['profile'] in profile_dict.keys():
-        fatal_error(f"mag_data variable profile is required to be one of {profile_dict.keys()}")
-    need_vars = profile_dict[mag_dict['profile']]
-    for var in need_vars:
-        if not var in mag_dict.keys():
+    mag_dict.setdefault('profile',"flat")
+    if mag_dict['profile'] not in _MAG_PROFILES:
+        fatal_error(f"mag_data variable profile is required to be one of {_MAG_PROFILES.keys()}")
+    for var in _MAG_PROFILES[mag_dict['profile']]:
+        if var not in mag_dict:
             fatal_error(f"mag_data variable {var} required for magnetic field profile {mag_dict['profile']}")
         if not np.isscalar(mag_dict[var]):
             fatal_error(f"mag_data property {var} must be a scalar")
@@ -80,6 +217,35 @@ def check_magnetic(mag_dict):
         fatal_error(f"No mag_field_func recipe for profile {mag_dict['profile']} found in astrophysics.magnetic_field_builder()")
     return mag_dict
 
+def _rho_norm(halo_dict,rho_c):
+    """
+    Fills in whichever of rho_norm and rho_norm_relative is missing from a halo dictionary
+
+    Arguments
+    ---------------------------
+    halo_dict : dictionary
+        Halo properties, must include z and, if neither normalisation is set, mvir
+    rho_c : float
+        Critical density at the halo redshift [Msun/Mpc^3]
+
+    Returns
+    ---------------------------
+    halo_dict : dictionary
+        Halo properties with both rho_norm and rho_norm_relative set
+    """
+    rho_n = halo_dict.get('rho_norm',_MISSING)
+    rho_rel = halo_dict.get('rho_norm_relative',_MISSING)
+    if rho_n is _MISSING and rho_rel is not _MISSING:
+        halo_dict['rho_norm'] = rho_rel*rho_c
+    elif rho_n is not _MISSING and rho_rel is _MISSING:
+        halo_dict['rho_norm_relative'] = rho_n/rho_c
+    else:
+        rho_n = halo_dict['mvir']/astrophysics.rho_virial_int(halo_dict)
+        halo_dict['rho_norm'] = rho_n
+        halo_dict['rho_norm_relative'] = rho_n/rho_c
+    return halo_dict
+
+@_require_dict_args('halo_dict','cosmo_dict')
 def check_halo(halo_dict,cosmo_dict,minimal=False):
     """
     Checks the properties of a halo dictionary
@@ -98,46 +264,31 @@ def check_halo(halo_dict,cosmo_dict,minimal=False):
     halo_dict : dictionary
         Halo information in compliance with DarkMatters requirements, code will exit if this cannot be achieved
     """
-    if not type(halo_dict) is dict:
-        fatal_error("dictionary_checks.check_halo() must be passed a dictionary as its argument")
-    if ((not 'z' in halo_dict.keys()) or halo_dict['z'] == 0.0) and not 'distance' in halo_dict.keys():
+    if (('z' not in halo_dict) or halo_dict['z'] == 0.0) and 'distance' not in halo_dict:
         fatal_error("In halo_data, either 'distance' must be specified or 'z' must be non-zero")
-    elif not 'z' in halo_dict.keys():
+    elif 'z' not in halo_dict:
         halo_dict['z'] = 0.0
-    elif not 'distance' in halo_dict.keys():
+    elif 'distance' not in halo_dict:
         halo_dict['distance'] = cosmology.dist_luminosity(halo_dict['z'],cosmo_dict)
     if minimal:
         return halo_dict
-    in_file = open(os.path.join(os.path.dirname(os.path.realpath(__file__)),"config/halo_density_profiles.yaml"),"r")
-    halo_params = yaml.load(in_file,Loader=yaml.SafeLoader)
-    in_file.close()
-    def rho_norm(halo_dict,cosmo_dict):
-        if (not "rho_norm" in halo_dict.keys()) and ("rho_norm_relative" in halo_dict.keys()):
-            halo_dict['rho_norm'] = halo_dict['rho_norm_relative']*cosmology.rho_crit(halo_dict['z'],cosmo_dict)
-        elif ("rho_norm" in halo_dict.keys()) and (not "rho_norm_relative" in halo_dict.keys()):
-            halo_dict['rho_norm_relative'] = halo_dict['rho_norm']/cosmology.rho_crit(halo_dict['z'],cosmo_dict)
-        else:
-            halo_dict['rho_norm'] = halo_dict['mvir']/astrophysics.rho_virial_int(halo_dict)
-            halo_dict['rho_norm_relative'] = halo_dict['rho_norm']/cosmology.rho_crit(halo_dict['z'],cosmo_dict)
-        return halo_dict
-
-    if not 'halo_weights' in halo_dict.keys():
-        halo_dict['halo_weights'] = "rho"
-    if not 'profile' in halo_dict.keys():
+    z_ctx = cosmology.z_context(halo_dict['z'],cosmo_dict)
+    rho_c = z_ctx['rho_crit']
+    halo_dict.setdefault('halo_weights',"rho")
+    if 'profile' not in halo_dict:
         fatal_error("halo variable profile is required for non J/D-factor calculations")
     
-    var_set1 = ["rho_norm","mvir","rvir","rho_norm_relative"]
-    var_set2 = ["cvir","scale"]
-    if ((not len(set(var_set1).intersection(halo_dict.keys())) > 0) or (not len(set(var_set2).intersection(halo_dict.keys())) > 0)) and not ("rvir" in halo_dict.keys() or "mvir" in halo_dict.keys()):
-        fatal_error(f"Halo specification requires 1 halo variable from {var_set1} and 1 from {var_set2}")
+    has1 = any(v in halo_dict for v in _VAR_SET1)
+    has2 = any(v in halo_dict for v in _VAR_SET2)
+    if (not has1 or not has2) and ('rvir' not in halo_dict and 'mvir' not in halo_dict):
+        fatal_error(f"Halo specification requires 1 halo variable from {list(_VAR_SET1)} and 1 from {list(_VAR_SET2)}")
     else:
-        if halo_dict['profile'] not in halo_params.keys():
-            fatal_error(f"Halo specification requires profile from: {halo_params.keys()}")
+        if halo_dict['profile'] not in _HALO_PROFILES:
+            fatal_error(f"Halo specification requires profile from: {_HALO_PROFILES.keys()}")
         else:
-            for x in halo_params[halo_dict['profile']]:
-                if not x == "none":
-                    if not x in halo_dict.keys():
-                        fatal_error(f"profile {halo_dict['profile']} requires property {x} be set")
+            for x in _HALO_PROFILES[halo_dict['profile']]:
+                if x != "none" and x not in halo_dict:
+                    fatal_error(f"profile {halo_dict['profile']} requires property {x} be set")
         if halo_dict["profile"] == "burkert":
             #rescale to reflect where dlnrho/dlnr = -2 (required as cvir = rvir/r_{-2})
             #isothermal, nfw, einasto all have rs = r_{-2}
@@ -146,61 +297,58 @@ def check_halo(halo_dict,cosmo_dict,minimal=False):
             scale_mod = 2.0 - halo_dict['index']
         else:
             scale_mod = 1.0
-        rs_info = "scale" in halo_dict.keys() 
-        rho_info = "rho_norm" in halo_dict.keys() or "rho_norm_relative" in halo_dict.keys()
-        rvir_info = "rvir" in halo_dict.keys() or "mvir" in halo_dict.keys()
+        mvir = halo_dict.get('mvir',_MISSING)
+        rvir = halo_dict.get('rvir',_MISSING)
+        rs_info = "scale" in halo_dict
+        rho_info = "rho_norm" in halo_dict or "rho_norm_relative" in halo_dict
+        rvir_info = mvir is not _MISSING or rvir is not _MISSING
         if  rs_info and rho_info:
-            if not "rho_norm_relative" in halo_dict.keys():
-                halo_dict['rho_norm_relative'] = halo_dict['rho_norm']/cosmology.rho_crit(halo_dict['z'],cosmo_dict)
-            elif not "rho_norm" in halo_dict.keys():
-                halo_dict['rho_norm'] = halo_dict['rho_norm_relative']*cosmology.rho_crit(halo_dict['z'],cosmo_dict)
-            if (not "mvir" in halo_dict.keys()) and ("rvir" in halo_dict.keys()):
-                halo_dict['mvir'] = halo_dict['rho_norm']*astrophysics.rho_volume_int(halo_dict)
-            elif ("mvir" in halo_dict.keys()) and (not "rvir" in halo_dict.keys()):
-                halo_dict['rvir'] = cosmology.rvir_from_mvir(halo_dict['mvir'],halo_dict['z'],cosmo_dict)
-            elif (not "mvir" in halo_dict.keys()) and (not "rvir" in halo_dict.keys()):
-                halo_dict['rvir']= astrophysics.rvir_from_rho(halo_dict,cosmo_dict)
-                halo_dict['mvir'] = cosmology.mvir_from_rvir(halo_dict['rvir'],halo_dict['z'],cosmo_dict)
-            if not "cvir" in halo_dict.keys():
-                halo_dict['cvir'] = halo_dict['rvir']/halo_dict['scale']/scale_mod
-        elif rvir_info and rs_info:
-            if not 'rvir' in halo_dict.keys():
-                halo_dict['rvir'] = cosmology.rvir_from_mvir(halo_dict['mvir'],halo_dict['z'],cosmo_dict)
-            if not 'cvir' in halo_dict.keys():
-                halo_dict['cvir'] = halo_dict['rvir']/halo_dict['scale']/scale_mod
-            if not 'mvir' in halo_dict.keys():
-                halo_dict['mvir'] = cosmology.mvir_from_rvir(halo_dict['rvir'],halo_dict['z'],cosmo_dict)
-            else:
-                if not 'rvir' in halo_dict.keys():
-                    halo_dict['rvir'] = cosmology.rvir_from_mvir(halo_dict['mvir'],halo_dict['z'],cosmo_dict)
-                if not 'cvir' in halo_dict.keys():
-                    halo_dict['cvir'] = halo_dict['rvir']/halo_dict['scale']/scale_mod
-            halo_dict = rho_norm(halo_dict,cosmo_dict)
-        elif rvir_info and 'cvir' in halo_dict.keys():
-            if not 'mvir' in halo_dict.keys():
-                halo_dict['mvir'] = cosmology.mvir_from_rvir(halo_dict['rvir'],halo_dict['z'],cosmo_dict)
-            if not 'rvir' in halo_dict.keys():
-                halo_dict['rvir'] = cosmology.rvir_from_mvir(halo_dict['mvir'],halo_dict['z'],cosmo_dict)
-            if not 'scale' in halo_dict.keys():
-                halo_dict['scale'] = halo_dict['rvir']/halo_dict['cvir']/scale_mod
-            halo_dict = rho_norm(halo_dict,cosmo_dict)
+            rho_n = halo_dict.get('rho_norm',_MISSING)
+            rho_rel = halo_dict.get('rho_norm_relative',_MISSING)
+            if rho_rel is _MISSING:
+                halo_dict['rho_norm_relative'] = rho_n/rho_c
+            elif rho_n is _MISSING:
+                rho_n = rho_rel*rho_c
+                halo_dict['rho_norm'] = rho_n
+            if mvir is _MISSING and rvir is not _MISSING:
+                halo_dict['mvir'] = rho_n*astrophysics.rho_volume_int(halo_dict)
+            elif mvir is not _MISSING and rvir is _MISSING:
+                rvir = cosmology.rvir_from_ctx(mvir,z_ctx)
+                halo_dict['rvir'] = rvir
+            elif mvir is _MISSING and rvir is _MISSING:
+                rvir = astrophysics.rvir_from_rho(halo_dict,cosmo_dict)
+                halo_dict['rvir'] = rvir
+                halo_dict['mvir'] = cosmology.mvir_from_ctx(rvir,z_ctx)
+            if "cvir" not in halo_dict:
+                halo_dict['cvir'] = rvir/halo_dict['scale']/scale_mod
         elif rvir_info:
-            if not 'mvir' in halo_dict.keys():
-                halo_dict['mvir'] = cosmology.mvir_from_rvir(halo_dict['rvir'],halo_dict['z'],cosmo_dict)
-            if not 'rvir' in halo_dict.keys():
-                halo_dict['rvir'] = cosmology.rvir_from_mvir(halo_dict['mvir'],halo_dict['z'],cosmo_dict)
-            halo_dict['cvir'] = cosmology.cvir(halo_dict['mvir'],halo_dict['z'],cosmo_dict)
-            halo_dict['scale'] = halo_dict['rvir']/halo_dict['cvir']/scale_mod
-            halo_dict = rho_norm(halo_dict,cosmo_dict)
+            #at least one of mvir, rvir is set here, fill in the other
+            if rvir is _MISSING:
+                rvir = cosmology.rvir_from_ctx(mvir,z_ctx)
+                halo_dict['rvir'] = rvir
+            elif mvir is _MISSING:
+                mvir = cosmology.mvir_from_ctx(rvir,z_ctx)
+                halo_dict['mvir'] = mvir
+            if rs_info:
+                if 'cvir' not in halo_dict:
+                    halo_dict['cvir'] = rvir/halo_dict['scale']/scale_mod
+            elif 'cvir' in halo_dict:
+                halo_dict['scale'] = rvir/halo_dict['cvir']/scale_mod
+            else:
+                cvir = cosmology.cvir(mvir,halo_dict['z'],cosmo_dict)
+                halo_dict['cvir'] = cvir
+                halo_dict['scale'] = rvir/cvir/scale_mod
+            halo_dict = _rho_norm(halo_dict,rho_c)
         else:
             fatal_error(f"halo_data is underspecified by {halo_dict}")
     halo_dict['halo_density_func'] = astrophysics.halo_density_builder(halo_dict)
-    if not "green_averaging_scale" in halo_dict.keys():
+    if "green_averaging_scale" not in halo_dict:
         halo_dict["green_averaging_scale"] = halo_dict['scale']
     if halo_dict['halo_density_func'] is None:
         fatal_error(f"No halo_density_func recipe for profile {halo_dict['profile']} found in astrophysics.halo_density_builder()")
     return halo_dict
 
+@_require_dict_args('gas_dict')
 def check_gas(gas_dict):
     """
     Checks the properties of a gas dictionary
@@ -215,17 +363,11 @@ def check_gas(gas_dict):
     gas_dict : dictionary
         Gas information in compliance with DarkMatters requirements, code will exit if this cannot be achieved
     """
-    if not type(gas_dict) is dict:
-        fatal_error("dictionary_checks.check_gas() must be passed a dictionary as its argument")
-    in_file = open(os.path.join(os.path.dirname(os.path.realpath(__file__)),"config/gas_density_profiles.yaml"),"r")
-    gas_params = yaml.load(in_file,Loader=yaml.SafeLoader)
-    in_file.close()
-    if not 'profile' in gas_dict.keys():
+    if 'profile' not in gas_dict:
         gas_dict['profile'] = "flat"
     else:
-        need_vars = gas_params[gas_dict['profile']]
-        for var in need_vars:
-            if not var in gas_dict.keys():
+        for var in _GAS_PROFILES[gas_dict['profile']]:
+            if var not in gas_dict:
                 print(f"gas_data variable {var} is required for magnetic field profile {gas_dict['profile']}")
                 fatal_error("gas_data underspecified")
     gas_dict['gas_density_func'] = astrophysics.gas_density_builder(gas_dict)
@@ -233,6 +375,7 @@ def check_gas(gas_dict):
         fatal_error(f"No gas_density_func recipe for profile {gas_dict['profile']} found in astrophysics.gas_density_builder()")
     return gas_dict   
 
+@_require_dict_args('calc_dict')
 def check_calculation(calc_dict):
     """
     Checks the properties of a calculation dictionary
@@ -247,72 +390,55 @@ def check_calculation(calc_dict):
     calc_dict : dictionary 
         Calculation information in compliance with DarkMatters requirements, code will exit if this cannot be achieved
     """
-    if not type(calc_dict) is dict:
-        fatal_error("dictionary_checks.check_calculation() must be passed a dictionary as its argument")
-    calc_params = {'all_electron_modes':["os-python","green-python","green-c"],'all_modes':["jflux","flux","sb"],"all_freqs":["radio","all","gamma","pgamma","sgamma","neutrinos_e","neutrinos_mu","neutrinos_tau"]}
-    if not 'm_wimp' in calc_dict.keys():
+    if 'm_wimp' not in calc_dict:
         fatal_error("calc_dict requires the variable m_wimp be set")
-    if not 'calc_mode' in calc_dict.keys() or (not calc_dict['calc_mode'] in calc_params['all_modes']):
-        fatal_error(f"calc_dict requires the variable calc_mode with options: {calc_params['all_modes']}")
-    if not 'freq_mode' in calc_dict.keys() or (not calc_dict['freq_mode'] in calc_params['all_freqs']):
-        fatal_error(f"calc_dict requires the variable freq_mode with options: {calc_params['all_freqs']}")
-    if not 'electron_mode' in calc_dict.keys():
-        calc_dict['electron_mode'] = "os-python"  
-    elif calc_dict['electron_mode'] not in calc_params['all_electron_modes']:
+    if 'calc_mode' not in calc_dict or (calc_dict['calc_mode'] not in _ALL_MODES):
+        fatal_error(f"calc_dict requires the variable calc_mode with options: {sorted(_ALL_MODES)}")
+    if 'freq_mode' not in calc_dict or (calc_dict['freq_mode'] not in _ALL_FREQS):
+        fatal_error(f"calc_dict requires the variable freq_mode with options: {sorted(_ALL_FREQS)}")
+    calc_dict.setdefault('electron_mode',"os-python")
+    if calc_dict['electron_mode'] not in _ALL_ELECTRON_MODES:
         fatal_error(f"electron_mode can only take the values: green-python, green-c, or os-python. Your value of {calc_dict['electron_mode']} is invalid")
-    if not 'out_cgs' in calc_dict.keys():
-        calc_dict['out_cgs'] = False
-    if not 'f_sample_values' in calc_dict.keys(): 
-        if not 'f_sample_limits' in calc_dict.keys():
+    is_green = 'green' in calc_dict['electron_mode']
+    calc_dict.setdefault('out_cgs',False)
+    if 'f_sample_values' not in calc_dict: 
+        if 'f_sample_limits' not in calc_dict:
             fatal_error("calc_dict requires one of the following variables: f_sample_limits, giving the minimum and maximum frequencies to be studied OR f_sample_values, an array of explicitly sampled frequencies")
-        if not 'f_sample_num' in calc_dict.keys():
-            calc_dict['f_sample_num'] = int((np.log10(calc_dict['f_sample_limits'][1]) - np.log10(calc_dict['f_sample_limits'][0]))/5)
-        if not 'f_sample_spacing' in calc_dict.keys():
-            calc_dict['f_sample_spacing'] = "log"
+        lo,hi = calc_dict['f_sample_limits']
+        if 'f_sample_num' not in calc_dict:
+            calc_dict['f_sample_num'] = max(1,int((np.log10(hi) - np.log10(lo))/5)) #at least one sample for narrow ranges
+        calc_dict.setdefault('f_sample_spacing',"log")
         if calc_dict['f_sample_spacing'] == "lin":
-            calc_dict['f_sample_values'] = np.linspace(calc_dict['f_sample_limits'][0],calc_dict['f_sample_limits'][1],num=calc_dict['f_sample_num'])
+            calc_dict['f_sample_values'] = np.linspace(lo,hi,num=calc_dict['f_sample_num'])
         else:
-            calc_dict['f_sample_values'] = np.logspace(np.log10(calc_dict['f_sample_limits'][0]),np.log10(calc_dict['f_sample_limits'][1]),num=calc_dict['f_sample_num'])
+            calc_dict['f_sample_values'] = np.geomspace(lo,hi,num=calc_dict['f_sample_num'])
     else:
         calc_dict['f_sample_num'] = len(calc_dict['f_sample_values'])
         calc_dict['f_sample_limits'] = [calc_dict['f_sample_values'][0],calc_dict['f_sample_values'][-1]]
         calc_dict['f_sample_spacing'] = "custom"
 
-    if not 'e_sample_num' in calc_dict.keys():
-        if 'green' in calc_dict['electron_mode']:
-            calc_dict['e_sample_num'] = 50
-        else:
-            calc_dict['e_sample_num'] = 80
-    if not 'r_sample_num' in calc_dict.keys():
-        if 'green' in calc_dict['electron_mode']:
-            calc_dict['r_sample_num'] = 50
-        else:
-            calc_dict['r_sample_num'] = 80
-    if not 'log10_r_sample_min_factor' in calc_dict.keys():
-        calc_dict['log10_r_sample_min_factor'] = -2
-    if not 'e_sample_min' in calc_dict.keys():
-        calc_dict['e_sample_min'] = (constants.m_e*constants.c**2).to("GeV").value #GeV
+    calc_dict.setdefault('e_sample_num',50 if is_green else 80)
+    calc_dict.setdefault('r_sample_num',50 if is_green else 80)
+    calc_dict.setdefault('log10_r_sample_min_factor',-2)
+    if 'e_sample_min' not in calc_dict:
+        calc_dict['e_sample_min'] = _m_e_gev() #GeV
 
     if calc_dict['calc_mode'] in ["flux","jflux"]:
-        if (not 'rmax_integrate' in calc_dict.keys()) and (not 'angmax_integrate' in calc_dict.keys()):
+        if ('rmax_integrate' not in calc_dict) and ('angmax_integrate' not in calc_dict):
             fatal_error(f"calc_dict requires one of the variables rmax_integrate or angmax_integrate for the selected mode: {calc_dict['calc_mode']}")
-        elif ('rmax_integrate' in calc_dict.keys()) and ('angmax_integrate' in calc_dict.keys()):
+        elif ('rmax_integrate' in calc_dict) and ('angmax_integrate' in calc_dict):
             fatal_error(f"calc_dict requires ONLY one of the variables rmax_integrate or angmax_integrate for the selected mode: {calc_dict['calc_mode']}")
 
-    if not calc_dict['calc_mode'] == "jflux":
-        if "green" in calc_dict['electron_mode']: 
-            if not 'thread_number' in calc_dict.keys():
-                calc_dict['thread_number'] = 4
-            if not "image_number" in calc_dict.keys():
-                calc_dict['image_number'] = 30
-            if (not 'electron_exec_file' in calc_dict.keys()):
-                calc_dict['electron_exec_file'] = os.path.join(os.path.dirname(os.path.realpath(__file__)),"emissions/electron.x")
-            if (not 'r_green_sample_num' in calc_dict.keys()):
-                calc_dict['r_green_sample_num'] = 61
+    if calc_dict['calc_mode'] != "jflux":
+        if is_green:
+            calc_dict.setdefault('thread_number',4)
+            calc_dict.setdefault('image_number',30)
+            if ('electron_exec_file' not in calc_dict):
+                calc_dict['electron_exec_file'] = os.path.join(_EMISSIONS_DIR,"electron.x")
+            calc_dict.setdefault('r_green_sample_num',61)
             if calc_dict['r_green_sample_num'] < 61:
                 fatal_error("r_green_sample_num cannot be set below 61 without incurring errors")
-            if (not 'e_green_sample_num' in calc_dict.keys()):
-                calc_dict['e_green_sample_num'] = 401
+            calc_dict.setdefault('e_green_sample_num',401)
             if calc_dict['e_green_sample_num'] < 201:
                 fatal_error("e_green_sample_num cannot be set below 201 without incurring substantial errors, recommended value is 401")
             if calc_dict['e_green_sample_num'] < 401:
@@ -322,37 +448,24 @@ def check_calculation(calc_dict):
             if (calc_dict['e_green_sample_num']-1)%4 != 0:
                 fatal_error(f"e_green_sample_num - 1 must be divisible by 4, you provided {calc_dict['e_green_sample_num']}")
         elif calc_dict['electron_mode'] == "os-python":
-            if not "os_final_tolerance" in calc_dict.keys():
-                calc_dict['os_final_tolerance'] = 1e-3 
-            if not "os_internal_tolerance" in calc_dict.keys():
-                calc_dict['os_internal_tolerance'] = 1e-5 
-            if not "os_delta_ti" in calc_dict.keys():
-                calc_dict['os_delta_ti'] = 1e9 
-            if not "os_delta_t_reduction" in calc_dict.keys():
-                calc_dict['os_delta_t_reduction'] = 0.5 
-            if not "os_max_steps" in calc_dict.keys():
-                calc_dict['os_max_steps'] = 100
-            if not "os_delta_t_constant" in calc_dict.keys():
-                calc_dict['os_delta_t_constant'] = False 
-            if not "os_bench_mark_mode" in calc_dict.keys():
-                calc_dict['os_bench_mark_mode'] = False  
-            if not 'os_delta_t_min' in calc_dict.keys():
-                calc_dict['os_delta_t_min'] = 1e1  
+            calc_dict.setdefault('os_final_tolerance',1e-3)
+            calc_dict.setdefault('os_internal_tolerance',1e-5)
+            calc_dict.setdefault('os_delta_ti',1e9)
+            calc_dict.setdefault('os_delta_t_reduction',0.5)
+            calc_dict.setdefault('os_max_steps',100)
+            calc_dict.setdefault('os_delta_t_constant',False)
+            calc_dict.setdefault('os_bench_mark_mode',False)
+            calc_dict.setdefault('os_delta_t_min',1e1)
+            calc_dict.setdefault('os_single_precision',False)
     else:
-        if not calc_dict['freq_mode'] in ["pgamma","neutrinos_mu","neutrinos_e","neutrinos_tau"]:
+        if calc_dict['freq_mode'] not in _JFLUX_FREQS:
             fatal_error("calc_data freq_mode parameter can only be pgamma, or neutrinos_x (x= e, mu, or tau) for calc_mode jflux")
-    green_only_params = ["r_green_sample_num","e_green_sample_num","thread_number","image_number"]
-    os_only_params = ["os_delta_t_reduction","os_delta_ti","os_max_steps","os_delta_t_constant","os_bench_mark_mode","os_delta_t_min","os_final_tolerance","os_internal_tolerance"]
-    if "green" in calc_dict['electron_mode']:
-        for p in os_only_params:
-            if p in calc_dict.keys():
-                calc_dict.pop(p)
-    else:
-        for p in green_only_params:
-            if p in calc_dict.keys():
-                calc_dict.pop(p)
+    drop = _OS_ONLY if is_green else _GREEN_ONLY
+    for p in drop:
+        calc_dict.pop(p,None)
     return calc_dict 
 
+@_require_dict_args('part_dict','calc_dict')
 def check_particles(part_dict,calc_dict):
     """
     Checks the properties of a particle physics dictionary
@@ -369,38 +482,28 @@ def check_particles(part_dict,calc_dict):
     part_dict : dictionary 
         Particle physics in compliance with DarkMatters requirements, code will exit if this cannot be achieved
     """
-    if not type(calc_dict) is dict or not type(part_dict) is dict:
-        fatal_error("dictionary_checks.check_particles() must be passed a dictionaries as its argument")
-    if not 'part_model' in part_dict.keys():
+    if 'part_model' not in part_dict:
         fatal_error("part_dict requires a part_model value")
-    if not 'em_model' in part_dict.keys():
-        part_dict['em_model'] = "annihilation"
-    elif not part_dict['em_model'] in ["annihilation","decay"]:
+    part_dict.setdefault('em_model',"annihilation")
+    if part_dict['em_model'] not in _ANN_DECAY:
         fatal_error("em_model must be set to either annihilation or decay")
-    if not 'decay_input' in part_dict.keys():
-        part_dict['decay_input'] = False
-    if not 'spectrum_directory' in part_dict.keys():
-        part_dict['spectrum_directory'] = os.path.join(os.path.dirname(os.path.realpath(__file__)),"particle_physics")
+    part_dict.setdefault('decay_input',False)
+    part_dict.setdefault('spectrum_directory',_PART_DIR)
     if not isdir(part_dict['spectrum_directory']):
         warning(f"part_data['spectrum_directory'] = {part_dict['spectrum_directory']} is not a valid folder, using default instead")
-        part_dict['spectrum_directory'] = os.path.join(os.path.dirname(os.path.realpath(__file__)),"particle_physics")
-    spec_set = []
-    if "neutrinos" in calc_dict['freq_mode']:
-        spec_set.append(calc_dict['freq_mode'])
-    if calc_dict['freq_mode'] in ["gamma","pgamma","sgamma","all"]:
-        spec_set.append("gammas")
-    if calc_dict['freq_mode'] in ['sgamma',"radio","all","gamma"]:
-        spec_set.append("positrons")
-    part_dict['d_ndx_interp'] = get_spectral_data(part_dict['spectrum_directory'],part_dict['part_model'],spec_set,mode=part_dict["em_model"])
-    if 'cross_section' in part_dict.keys() and 'decay_rate' in part_dict.keys():
+        part_dict['spectrum_directory'] = _PART_DIR
+    spec_set = list(_FREQ_TO_SPECSET.get(calc_dict['freq_mode'],()))
+    part_dict['d_ndx_interp'] = _cached_get_spectral_data(part_dict['spectrum_directory'],part_dict['part_model'],tuple(spec_set),part_dict["em_model"])
+    if 'cross_section' in part_dict and 'decay_rate' in part_dict:
         fatal_error("You cannot have both a cross_section and decay_rate set for the particle physics")
-    elif not 'cross_section' in part_dict.keys() and not 'decay_rate' in part_dict.keys():
+    elif 'cross_section' not in part_dict and 'decay_rate' not in part_dict:
         if part_dict['em_model'] == "annihilation":
             part_dict['cross_section'] = 1e-26
         else:
             part_dict['decay_rate'] = 1e-26
     return part_dict
 
+@_require_dict_args('diff_dict')
 def check_diffusion(diff_dict):
     """
     Checks the properties of a diffusion dictionary
@@ -415,21 +518,13 @@ def check_diffusion(diff_dict):
     diff_dict : dictionary
         Diffusion information in compliance with DarkMatters requirements, code will exit if this cannot be achieved
     """
-    if not type(diff_dict) is dict:
-        fatal_error("dictionary_checks.check_diffusion() must be passed a dictionary as its argument")
-    if not 'loss_only' in diff_dict.keys():
-        diff_dict['loss_only'] = False
-    if not 'photon_density' in diff_dict.keys():
-        diff_dict['photon_density'] = 0.0
-    if not 'photon_temp' in diff_dict.keys():
-        diff_dict['photon_temp'] = 2.7255
-    if not 'diff_rmax' in diff_dict.keys():
-        diff_dict['diff_rmax'] = "2*Rvir"
+    diff_dict.setdefault('loss_only',False)
+    diff_dict.setdefault('photon_density',0.0)
+    diff_dict.setdefault('photon_temp',2.7255)
+    diff_dict.setdefault('diff_rmax',"2*Rvir")
     if diff_dict['loss_only']:
         diff_dict['diff_constant'] = 0.0
     else:
-        if not 'diff_constant' in diff_dict.keys():
-            diff_dict['diff_constant'] = 3e28
-        if not 'diff_index' in diff_dict.keys():
-            diff_dict['diff_index'] = 1.0/3
+        diff_dict.setdefault('diff_constant',3e28)
+        diff_dict.setdefault('diff_index',1.0/3)
     return diff_dict
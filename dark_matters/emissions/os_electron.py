@@ -3,12 +3,38 @@ DarkMatters.emissions module for calculating  electron equilibrium distributions
 """
 import time,warnings
 import numpy as np
-from scipy import sparse
+from scipy.linalg import lapack
 from astropy import units, constants
 from .progress_bar import progress
 from ..output import warning,spacer_length
 
 
+def tridiag_dot(lower,diag,upper,x):
+    """
+    Product of a tridiagonal matrix with a vector, as a three-point stencil
+
+    Arguments
+    ---------------------------
+    lower : array-like float (k-1) or None
+        Sub-diagonal of the matrix, None if it is zero
+    diag : array-like float (k)
+        Main diagonal of the matrix
+    upper : array-like float (k-1)
+        Super-diagonal of the matrix
+    x : array-like float (k)
+        Vector to be multiplied
+
+    Returns
+    ---------------------------
+    y : array-like float (k)
+        Matrix-vector product
+    """
+    y = diag*x
+    if lower is not None:
+        y[1:] += lower*x[:-1]
+    y[:-1] += upper*x[1:]
+    return y
+
 class os_scheme:
     """
     Operator splitting solution class
@@ -21,6 +47,8 @@ class os_scheme:
         Flag for constant time-step (testing only)
     animation_flag : boolean
         Flag for producing animation showing evolution of solution (slow)
+    single_precision : boolean
+        Flag for iterating in float32 (faster, accurate to ~1e-4 relative)
 
     Attributes
     ---------------------------
@@ -46,6 +74,10 @@ class os_scheme:
         Energy derivative of loss function [s^-1]
     loss_constants : dictionary
         Dictionary of energy-loss coefficients [GeV s^-1]
+    loss_alphas : tuple of array-like float
+        Energy propagation coefficients per unit time-step, as matrix diagonals
+    diff_alphas : tuple of array-like float
+        Spatial propagation coefficients per unit time-step, as matrix diagonals
     r0 : float
         Radial normalisation scale
     E0 : float
@@ -58,6 +90,10 @@ class os_scheme:
         Log10 of normalised energy samples
     Delta_E : float
         Log-spacing of normalised energy samples
+    r_pref : array-like float (n)
+        Log-transform prefactors at each radial sample [cm^-1]
+    E_pref : array-like float (m)
+        Log-transform prefactors at each energy sample [GeV^-1]
     delta_t : float
         Current time-step [s]
     delta_ti : float
@@ -82,6 +118,8 @@ class os_scheme:
         Flag for constant time-step (testing only)
     animation_flag : boolean
         Flag for producing animation showing evolution of solution (slow)
+    dtype : numpy dtype
+        Working precision of the OS iterations (float32 if single_precision is set, else float64)
     electrons : array-like float (n,m)
         Output electron equilibrium distribution [GeV cm^-3]
     solve_electrons : function
@@ -108,14 +146,18 @@ class os_scheme:
         Second propagator coefficient in energy 
     e_alpha3 : function
         Third propagator coefficient in energy 
+    set_loss_alphas : function
+        Builds energy propagation coefficients per unit time-step
+    set_diff_alphas : function
+        Builds spatial propagation coefficients per unit time-step
     spmatrices_loss : function
-        Builds sparse matrices for energy propagator
+        Builds tridiagonal matrices for energy propagator
     spmatrices_diff : function
-        Builds sparse matrices for spatial propagator
+        Builds tridiagonal matrices for spatial propagator
     os_2d : function
         Runs OS solution
     """
-    def __init__(self,benchmark_flag=False,const_delta_t=False,animation_flag=False):
+    def __init__(self,benchmark_flag=False,const_delta_t=False,animation_flag=False,single_precision=False):
         self.effect = None      #which effects to include in the solution of the transport equation (in set {"loss","diffusion","all"})
 
         self.Q = None           #source function (2D np array, size r_bins x E_bins) [pc, GeV^-1]
@@ -129,12 +171,16 @@ class os_scheme:
         self.E0 = None          #energy scale value  
         self.logr_grid = None   #log-transformed spatial grid
         self.logE_grid = None   #log-transformed energy grid 
+        self.r_pref = None      #prefactors for log-transformed spatial derivatives
+        self.E_pref = None      #prefactors for log-transformed energy derivatives
         
         self.D = None           #diffusion function, sampled at (r_grid,E_grid)
         self.dDdr = None        #derivative of diffusion function, sampled at (r_grid,E_grid)
         self.b = None           #energy loss function, sampled at (r_grid,E_grid)
         self.dbdE = None        #derivative of energy loss function, sampled at (r_grid,E_grid)
         self.loss_constants = None   #dictionary of constants for energy loss functions (dict) [GeV s^-1]
+        self.loss_alphas = None #energy propagation coefficients per unit delta_t, as matrix diagonals
+        self.diff_alphas = None #spatial propagation coefficients per unit delta_t, as matrix diagonals
 
         self.Delta_r = None     #step size for space dimension after transform (dimensionless)
         self.Delta_E = None     #step size for energy dimension after transform (dimensionless)
@@ -153,7 +199,8 @@ class os_scheme:
         self.final_stability_tol = None
         
         self.animation_flag = animation_flag      #flag for whether animations take place or not
-        self.snapshots = None   #stores snapshots of psi and delta_t at each iteration for animation
+        self.dtype = np.float32 if single_precision else np.float64    #precision of the matrices and psi during iterations
+        self.snapshots = None   #stores snapshots of psi (float32 array, iterations x (r_bins-1) x E_bins) and delta_t (array) at each iteration for animation
         
     def solve_electrons(self,mx,z,E_sample,r_sample,rho_sample,q_sample,b_sample,dBdr_sample,ne_sample,r_scale,e_scale,delta,diff0=3.1e28,u_ph=0.0,loss_only=False,mode_exp=2,delta_t_min=1e1,delta_ti=1e9,max_t_part=100,delta_t_reduction=0.5,f_tol=1e-3,i_tol=1e-5):
         """
@@ -234,17 +281,21 @@ class os_scheme:
         #new log-transformed (and now linspaced) grid
         self.logr_grid = logr(self.r_grid)           #[/]
         self.logE_grid = log_e(self.E_grid)           #[/]
+        #prefactors d(log10 x)/dx = 1/(x ln10), fixed for the whole run
+        self.r_pref = 1.0/(self.r_grid*np.log(10))
+        self.E_pref = 1.0/(self.E_grid*np.log(10))
         
         """ Diffusion/energy loss functions """
         self.loss_constants = {'IC1eVcm-3': 1.02e-16, 'ICCMB': 0.265e-16*(1+z)**4, 'sync':0.0254e-16, 'coul':7.6e-18, 'brem':1.39e-16}
 
         rho_sample = (rho_sample*units.Unit("Msun/Mpc^3")*constants.c**2).to("GeV/cm^3").value
         dBdr_sample = (dBdr_sample*units.Unit("1/Mpc")).to("1/cm").value
-        self.Q = 1/mode_exp*(np.tensordot(rho_sample,np.ones_like(self.E_grid),axes=0)/mx)**mode_exp*np.tensordot(np.ones_like(rho_sample),q_sample,axes=0)
-        Etens = np.tensordot(np.ones(self.r_bins),self.E_grid,axes=0)
-        Btens = np.tensordot(b_sample, np.ones(self.E_bins),axes=0)           
-        netens = np.tensordot(ne_sample, np.ones(self.E_bins),axes=0)          
-        dBdrtens = np.tensordot(dBdr_sample, np.ones(self.E_bins),axes=0)        
+        #radial quantities as (n,1) columns and energies as a (1,m) row, broadcasting to (n,m)
+        self.Q = 1/mode_exp*(rho_sample[:,None]/mx)**mode_exp*q_sample[None,:]
+        Etens = self.E_grid[None,:]
+        Btens = b_sample[:,None]
+        netens = ne_sample[:,None]
+        dBdrtens = dBdr_sample[:,None]
 
         self.D = self.set_d(Btens,Etens)
         self.dDdr = self.set_dDdr(Btens,dBdrtens,Etens)
@@ -313,9 +364,9 @@ class os_scheme:
 
         Arguments
         -------------------------
-        B : array-like float (n,m)
+        B : array-like float (n,1)
             Magnetic field strength [uG] 
-        E : array-like float (n,m)
+        E : array-like float (1,m)
             Energy array [GeV]
         
         Returns
@@ -338,11 +389,11 @@ class os_scheme:
 
         Arguments
         -------------------------
-        B : array-like float (n,m)
+        B : array-like float (n,1)
             Magnetic field strength [uG]
-        dBdr : array-like float (n,m)
+        dBdr : array-like float (n,1)
             Magnetic field derivative [uG cm^-1] 
-        E : array-like float (n,m)
+        E : array-like float (1,m)
             Energy array [GeV]
         
         Returns
@@ -353,12 +404,13 @@ class os_scheme:
         #set and return spatial derivative of diffusion function [cm s^-1]
         D0 = self.D0     #[D0] = cm^2 s^-1
 
-        #prefactor (pf) needed for log-transformed derivative 
-        pf = np.tile(self.r_prefactor(np.arange(self.r_bins)),(self.E_bins,1)).transpose()
+        #prefactor (pf) needed for log-transformed derivative, broadcast along energy
+        pf = self.r_pref[:,None]
+        B_max = np.max(B)
         with np.errstate(divide="ignore",invalid="ignore"):
             with warnings.catch_warnings():
                 warnings.filterwarnings('ignore', r'overflow')
-                dDdr = -(1.0/pf*D0*self.delta)*(B/np.max(B))**(-self.delta-1)*dBdr/np.max(B)*E**self.delta
+                dDdr = -(1.0/pf*D0*self.delta)*(B/B_max)**(-self.delta-1)*dBdr/B_max*E**self.delta
         self.dDdr = dDdr
         return dDdr
         
@@ -368,11 +420,11 @@ class os_scheme:
 
         Arguments
         -------------------------
-        B : array-like float (n,m)
+        B : array-like float (n,1)
             Magnetic field strength [uG]
-        ne : array-like density (n,m)
+        ne : array-like density (n,1)
             Gas density [cm^-3] 
-        E : array-like float (n,m)
+        E : array-like float (1,m)
             Energy array [GeV]
         u_ph : float
             Photon energy density [eV cm^-3]
@@ -392,7 +444,7 @@ class os_scheme:
             with warnings.catch_warnings():
                 warnings.filterwarnings('ignore', r'overflow')
                 coulomb = b['coul']*ne*(73.0+np.log(E/me/ne))
-        coulomb = np.where(np.logical_or(np.isnan(coulomb),np.isinf(coulomb)),0.0,coulomb)
+        coulomb[~np.isfinite(coulomb)] = 0.0     #zero the undefined points in place (e.g. ne = 0)
         eloss += coulomb
         self.b = eloss
         return eloss
@@ -414,7 +466,7 @@ class os_scheme:
         -----------------------
         Normalisation factor [cm^-1]
         """
-        return (10**self.logr_grid[i]*np.log(10)*self.r0)**-1
+        return self.r_pref[i]
 
     def e_prefactor(self,j):
         """
@@ -429,7 +481,7 @@ class os_scheme:
         -----------------------
         Normalisation factor [GeV^-1]
         """
-        return (10**self.logE_grid[j]*np.log(10)*self.E0)**-1     
+        return self.E_pref[j]     
     
     
     """ 
@@ -455,7 +507,7 @@ class os_scheme:
         Alpha_1 coefficient [cm^-2]
         """
         alpha = np.zeros(i.shape)
-        alpha[:] = self.delta_t*self.r_prefactor(i)**2*(-(np.log10(10)*self.D[i,j] + self.dDdr[i,j])/(2*self.Delta_r) + self.D[i,j]/self.Delta_r**2)
+        alpha[:] = self.delta_t*self.r_prefactor(i)**2*(-(self.D[i,j] + self.dDdr[i,j])/(2*self.Delta_r) + self.D[i,j]/self.Delta_r**2)
         
         return alpha
             
@@ -497,7 +549,7 @@ class os_scheme:
         """
         alpha = np.zeros(i.shape)
         alpha[0] = self.delta_t*self.r_prefactor(0)**2*4*self.D[0,j]/self.Delta_r**2 
-        alpha[1:] = self.delta_t*self.r_prefactor(i[1:])**2*((np.log10(10)*self.D[i[1:],j] + self.dDdr[i[1:],j])/(2*self.Delta_r) + self.D[i[1:],j]/self.Delta_r**2)
+        alpha[1:] = self.delta_t*self.r_prefactor(i[1:])**2*((self.D[i[1:],j] + self.dDdr[i[1:],j])/(2*self.Delta_r) + self.D[i[1:],j]/self.Delta_r**2)
 
         return alpha
          
@@ -556,67 +608,102 @@ class os_scheme:
 
         return alpha
         
-    def spmatrices_loss(self):
+    def set_loss_alphas(self):
         """ 
-        A,B Matrix constructors (for sparse block matrices)
-        Format is the same in each case - define the matrix diagonals (k_ - u=upper,m=middle,l=lower)
-        then construct matrix from those diagonals. 
+        Energy propagation coefficients for the whole grid, per unit time-step.
+        These do not depend on delta_t, so they are built once per solution.
 
         Returns
         --------------------------
-        Loss matrices [GeV^-1]
+        alphas : tuple of array-like float
+            (alpha_1,alpha_2,alpha_3)/delta_t as (lower,middle,upper) diagonals of the loss matrices (C ordering) [GeV^-1 s^-1]
+            alpha_1 is identically zero and is returned as None
         """
         I = self.r_bins
         J = self.E_bins
         IJ = I*J
 
-        #initialise full diagonals for coefficient matrices (need zeros for unassigned indices)
+        #alpha_2 coefficients for the whole grid at once, shape (I,J)
+        alpha2 = self.E_pref[None,:]*self.b/self.Delta_E
+        #alpha_3 couples j to j+1, the last interior point reuses its own coefficient (as in e_alpha3)
+        alpha3 = np.empty((I,J-1))
+        alpha3[:,:-1] = alpha2[:,1:J-1]
+        alpha3[:,-1] = alpha2[:,J-2]
+
+        #upper has J-1 non-zero elements per block (with 0's at end points), e_alpha1 is identically zero so no lower diagonal is stored
         k_u = np.zeros(IJ)
-        k_mA = np.zeros(IJ)
-        k_mB = np.zeros(IJ)
-        k_l = np.zeros(IJ)    
-        
-    	#populate diagonals block-by-block. Note upper+lower have J-1 non-zero elements (with 0's at end points)    
-        for i in np.arange(I):
-            k_u[i*J:(i+1)*J-1] = -self.e_alpha3(i,np.arange(J)[:-1])/2
-            k_mA[i*J:(i+1)*J] = 1+self.e_alpha2(i,np.arange(J))/2
-            k_mB[i*J:(i+1)*J] = 1-self.e_alpha2(i,np.arange(J))/2
-            k_l[i*J:(i+1)*J-1] = -self.e_alpha1(i,np.arange(J)[1:])/2
-            
-        #A, B matrix constructors from k diagonals              
-        loss_A = sparse.diags(diagonals=[k_l,k_mA,k_u],offsets=[-1,0,1],shape=(IJ,IJ),format="csr")
-        loss_B = sparse.diags(diagonals=[-k_l,k_mB,-k_u],offsets=[-1,0,1],shape=(IJ,IJ),format="csr")
-        
-        return (loss_A,loss_B)
-    
-    def spmatrices_diff(self):
+        k_u.reshape(I,J)[:,:-1] = alpha3
+
+        self.loss_alphas = (None,alpha2.ravel().astype(self.dtype,copy=False),k_u[:-1].astype(self.dtype,copy=False))
+        return self.loss_alphas
+
+    def set_diff_alphas(self):
         """ 
-        A,B Matrix constructors (for sparse block matrices)
-        Format is the same in each case - define the matrix diagonals (k_ - u=upper,m=middle,l=lower)
-        then construct matrix from those diagonals. 
+        Spatial propagation coefficients for the whole grid, per unit time-step.
+        These do not depend on delta_t, so they are built once per solution.
 
         Returns
         --------------------------
-        Diffusion matrices [cm^-2]
+        alphas : tuple of array-like float
+            (alpha_1,alpha_2,alpha_3)/delta_t as (lower,middle,upper) diagonals of the diffusion matrices (F ordering) [cm^-2 s^-1]
         """
         I = self.r_bins
         J = self.E_bins
         IJ = I*J
-         
+
+        #alpha coefficients for the whole grid at once, shape (I,J), row 0 is the r=0 boundary
+        r_pref2 = self.r_pref[:,None]**2
+        alpha1 = r_pref2*(-(self.D + self.dDdr)/(2*self.Delta_r) + self.D/self.Delta_r**2)
+        alpha2 = r_pref2*(2*self.D/self.Delta_r**2)
+        alpha3 = r_pref2*((self.D + self.dDdr)/(2*self.Delta_r) + self.D/self.Delta_r**2)
+        alpha2[0] = r_pref2[0]*4*self.D[0]/self.Delta_r**2
+        alpha3[0] = alpha2[0]
+
+        #diagonals run over blocks of fixed energy, hence the transposes (F ordering)
+        #Note upper+lower diagonals have I-1 non-zero elements (with 0's at end points)
         k_u = np.zeros(IJ)
-        k_mA = np.zeros(IJ)
-        k_mB = np.zeros(IJ)
-        k_l = np.zeros(IJ)    
+        k_u.reshape(J,I)[:,:-1] = alpha3[:-1].T
+        k_l = np.zeros(IJ)
+        k_l.reshape(J,I)[:,:-1] = alpha1[1:].T
+
+        self.diff_alphas = tuple(a.astype(self.dtype,copy=False) for a in (k_l[:-1],alpha2.ravel('F'),k_u[:-1]))
+        return self.diff_alphas
+
+    def spmatrices_loss(self):
+        """ 
+        A,B Matrix constructors (for tridiagonal block matrices)
+        Format is the same in each case - scale the alpha diagonals (u=upper,m=middle,l=lower) by the current delta_t
+        There is no lower diagonal, so A is upper bidiagonal and is returned in LAPACK banded storage for a 
+        direct back-substitution, B is returned as its (None,middle,upper) diagonals for tridiag_dot.
+
+        Returns
+        --------------------------
+        Loss matrices [GeV^-1]
+        """
+        (_,a_m,a_u) = self.loss_alphas
+        h = self.delta_t/2
+        loss_A = np.empty((2,len(a_m)),dtype=a_m.dtype)
+        loss_A[0,0] = 0.0
+        loss_A[0,1:] = -h*a_u
+        loss_A[1] = 1+h*a_m
+        loss_B = (None,1-h*a_m,h*a_u)
         
-        #Note upper+lower diagonals have I-1 non-zero elements (with 0's at end points)
-        for j in np.arange(J):
-            k_u[j*I:(j+1)*I-1] = -self.r_alpha3(np.arange(I)[:-1],j)/2
-            k_mA[j*I:(j+1)*I] = 1+self.r_alpha2(np.arange(I)[:],j)/2
-            k_mB[j*I:(j+1)*I] = 1-self.r_alpha2(np.arange(I)[:],j)/2
-            k_l[j*I:(j+1)*I-1] = -self.r_alpha1(np.arange(I)[1:],j)/2
-                          
-        diff_A = sparse.diags(diagonals=[k_l,k_mA,k_u],offsets=[-1,0,1],shape=(IJ,IJ),format="csr")
-        diff_B = sparse.diags(diagonals=[-k_l,k_mB,-k_u],offsets=[-1,0,1],shape=(IJ,IJ),format="csr")
+        return (loss_A,loss_B)
+    
+    def spmatrices_diff(self):
+        """ 
+        A,B Matrix constructors (for tridiagonal block matrices)
+        Format is the same in each case - scale the alpha diagonals (u=upper,m=middle,l=lower) by the current delta_t
+        A and B are returned as their (lower,middle,upper) diagonals, for the LAPACK tridiagonal solver and tridiag_dot.
+
+        Returns
+        --------------------------
+        Diffusion matrices [cm^-2]
+        """
+        (a_l,a_m,a_u) = self.diff_alphas
+        h = self.delta_t/2
+        diff_A = (-h*a_l,1+h*a_m,-h*a_u)
+        diff_B = (h*a_l,1-h*a_m,h*a_u)
 
         return (diff_A,diff_B)
 
@@ -645,28 +732,58 @@ class os_scheme:
         os_start = time.perf_counter()
         
         """ Preliminary setup """
-        #create A,B matrices for initial timestep        
+        #LAPACK routines matching the working precision
+        (gttrf,gttrs,tbtrs) = lapack.get_lapack_funcs(('gttrf','gttrs','tbtrs'),dtype=self.dtype)
+        #psi is linear in Q, so in single precision it is solved for in units of max(Q) to stay well inside float32 range
+        q_scale = np.max(np.abs(Q)) if self.dtype == np.float32 and np.any(Q) else 1.0
+
+        def factorise_diff(diff_A):
+            """
+            LU factorisation of the diffusion A diagonals (overwritten in place), warns if LAPACK reports A as singular
+            """
+            (dl,d,du,du2,ipiv,info) = gttrf(*diff_A,overwrite_dl=True,overwrite_d=True,overwrite_du=True)
+            if info != 0:
+                warning(f"OS diffusion matrix factorisation failed at delta_t = {self.delta_t:.3g} s (LAPACK gttrf info = {info}), A is singular and the solution will contain NaNs")
+            return (dl,d,du,du2,ipiv)
+
+        #create A,B matrices for initial timestep, from coefficients that only need building once
         if self.effect in {"loss","all"}:
+            self.set_loss_alphas()
             (loss_A,loss_B) = self.spmatrices_loss()
-            print(f"Sparsity of loss matrices A, B: {(np.prod(loss_A.shape)-loss_A.nnz)*100/(np.prod(loss_A.shape)):.3f}%")     
+            print(f"Sparsity of loss matrices A, B: {100-np.count_nonzero(loss_A)*100/np.size(Q)**2:.3f}%")     
         if self.effect in {"diffusion","all"}:
+            self.set_diff_alphas()
             (diff_A,diff_B) = self.spmatrices_diff()        
-            print(f"Sparsity of diffusion matrices A, B: {(np.prod(diff_A.shape)-diff_A.nnz)*100/(np.prod(diff_A.shape)):.3f}%")
+            #A only changes with delta_t, so factorise once and reuse
+            #gttrf works in the natural ordering (no fill-reducing permutation), and the A diagonals are not needed afterwards so they are factorised in place
+            diff_lu = factorise_diff(diff_A)
+            print(f"Sparsity of diffusion matrices A, B: {100-sum(np.count_nonzero(k) for k in diff_B)*100/np.size(Q)**2:.3f}%")
             
+        #source term per time-step, flattened in the ordering used by each half-step
+        Q_loss = (Q.flatten('C')*(self.delta_t/q_scale)).astype(self.dtype,copy=False)
+        Q_diff = (Q.flatten('F')*(self.delta_t/q_scale)).astype(self.dtype,copy=False)
+
         #set initial and boundary conditions
-        psi = np.zeros_like(Q)  
+        psi = np.zeros(Q.shape,dtype=self.dtype)
         psi[-1,:] = 0.0
 
         #set convergence and time_scale parameters
         convergence_check = False               #main convergence flag to break loop
         stability_check = False                 #flag for stability condition between iterations
-        loss_ts_check = False                   #psi_ts > loss_ts check
-        diff_ts_check = False                   #psi_ts > diff_ts check
-        ts_check = False                        #combination of ts_losscheck and ts_diffcheck
+        ts_check = False                        #psi_ts > loss_ts and/or diff_ts check
         benchmark_check = False                 #np.all(dpsidt==0), only for benchmarking runs
         rel_diff_check = False                  #relative difference between (t-1) and (t) < self.stability_tol
-        psi_ts = np.empty(psi.shape)            #for calculating psi_ts
-        psi_prev = np.empty(psi.shape)          #copy of psi at t-1, for determining stability and convergence checks
+        dpsi = np.empty((self.r_bins-1,self.E_bins))    #psi(t) - psi(t-1) away from the boundary, shared by all checks
+        rel_diff = np.zeros(dpsi.shape)         #relative change in psi between iterations
+        psi_ts = np.empty(dpsi.shape)           #for calculating psi_ts
+        #time_scales psi_ts has to exceed for the included effects (away from the boundary), exceeding both is exceeding their maximum
+        if self.effect == "loss":
+            ts_min = self.loss_ts[:-1]
+        elif self.effect == "diffusion":
+            ts_min = self.diff_ts[:-1]
+        elif self.effect == "all":
+            ts_min = np.maximum(self.loss_ts[:-1],self.diff_ts[:-1])
+        psi_prev = psi                          #psi at t-1, for determining stability and convergence checks
         delta_t_reduction = self.delta_t_reduction    #factor by which to reduce delta_t during timestep-switching in accelerated method
         # self.stability_tol = 1.0e-5                  #relative difference tolerance between iterations (for stability_check)
         # self.final_stability_tol = 1e-3              #as above but used for convergence at final time-step size
@@ -684,10 +801,25 @@ class os_scheme:
         I = self.r_bins
         J = self.E_bins
 
-        #create list of snapshots for animation
+        def update_rel_diff():
+            """
+            Fills rel_diff from dpsi and returns whether it is within the stability tolerance for the current delta_t
+            """
+            with np.errstate(divide="ignore",invalid="ignore"):
+                np.divide(dpsi,psi_prev[:-1],out=rel_diff)
+            np.abs(rel_diff,out=rel_diff)
+            rel_diff[np.isnan(rel_diff)] = 0.0
+            if self.delta_t <= self.smallest_delta_t:
+                return bool(np.all(rel_diff < self.final_stability_tol))
+            else:
+                return bool(np.all(rel_diff < self.stability_tol))    #[:-1] slice to ignore boundary condition, type conversion because np.bool != bool, get unexpected results sometimes 
+
+        #preallocate snapshots for animation (at most max_t iterations plus the initial state, float32 is plenty for plotting)
         if self.animation_flag is True:
-            snapshot = (psi.copy()[:-1],self.delta_t)
-            self.snapshots = [snapshot]
+            snap_psi = np.empty((max_t+1,I-1,J),dtype=np.float32)
+            snap_dt = np.empty(max_t+1)
+            np.multiply(psi[:-1],q_scale,out=snap_psi[0])
+            snap_dt[0] = self.delta_t
 
         """ Main OS loop """
         print("Beginning OS solution...")
@@ -724,39 +856,36 @@ class os_scheme:
                    smallest timestep, override (c1) and allow convergence
             """
             if t>1:
-                with np.errstate(divide="ignore",invalid="ignore"):
-                    rel_diff = np.abs(psi[:-1]/psi_prev[:-1]-1.0)
-                    rel_diff = np.where(np.isnan(rel_diff),0.0,rel_diff)
-                    if self.delta_t <= self.smallest_delta_t:
-                        rel_diff_check = bool(np.all(rel_diff < self.final_stability_tol)) 
-                    else:
-                        rel_diff_check = bool(np.all(rel_diff < self.stability_tol))    #[:-1] slice to ignore boundary condition, type conversion because np.bool != bool, get unexpected results sometimes 
-
-                #stability conditions - s1,s2
+                #all checks are built from a single difference array, written into preallocated buffers
+                #stability conditions - s1,s2 (the accelerated method only needs the iteration count here)
                 if self.const_delta_t:
+                    np.subtract(psi[:-1],psi_prev[:-1],out=dpsi)
+                    rel_diff_check = update_rel_diff()
                     stability_check = rel_diff_check 
                 else:
                     stability_check = t_part > max_t_part
                 
-                #time_scale for psi distribution changes - c1
-                dpsidt = (psi[:-1]-psi_prev[:-1])/self.delta_t
-                with np.errstate(divide="ignore",invalid="ignore"): #gets rid of divide by 0 warnings (when psi converges this time_scale should tend to inf)
-                    psi_ts = np.abs(psi[:-1]/dpsidt)    
+                #the convergence conditions are only read for stable iterations, and not while the accelerated method is still reducing delta_t
+                if stability_check and (self.const_delta_t or self.delta_t < self.smallest_delta_t):
+                    if not self.const_delta_t:
+                        np.subtract(psi[:-1],psi_prev[:-1],out=dpsi)
+
+                    #time_scale for psi distribution changes - c1, psi_ts = |psi/dpsidt| = |psi/dpsi|*delta_t
+                    with np.errstate(divide="ignore",invalid="ignore"): #gets rid of divide by 0 warnings (when psi converges this time_scale should tend to inf)
+                        np.divide(psi[:-1],dpsi,out=psi_ts)
+                        np.abs(psi_ts,out=psi_ts)
+                        psi_ts *= self.delta_t
+                    
+                    #relevent time_scale conditions for the included effects
+                    ts_check = bool(np.all(psi_ts > ts_min))
+
+                    #relative difference for (a2), only needed if (c1) fails
+                    if not (self.const_delta_t or ts_check):
+                        rel_diff_check = update_rel_diff()
                 
-                #set relevent time_scale conditions for each effect
-                loss_ts_check = np.all(psi_ts > self.loss_ts[:-1])
-                diff_ts_check = np.all(psi_ts > self.diff_ts[:-1])
-                if self.effect == "loss":
-                    ts_check = loss_ts_check
-                elif self.effect == "diffusion":
-                    ts_check = diff_ts_check
-                elif self.effect == "all":
-                    ts_check = loss_ts_check and diff_ts_check 
-            
-                #diagnostic benchmark check for machine-accuracy dpsidt convergence - b1
-                if self.benchmark_flag is True:
-                    with np.errstate(divide="ignore"):
-                        benchmark_check = np.all(np.abs(dpsidt) == 0)
+                    #diagnostic benchmark check for machine-accuracy dpsidt convergence - b1
+                    if self.benchmark_flag is True:
+                        benchmark_check = not np.any(dpsi)
 
             #check for convergence if iterations are stable (s1, s2)
             if stability_check:
@@ -781,11 +910,14 @@ class os_scheme:
                             #print(f"Numer of iterations since previous Delta t: {t_part}\n")
                             t_part = 0
                             
-                            #reconstruct A, B matrices with new delta_t
+                            #reconstruct A, B matrices, factorisations and source terms with new delta_t
                             if self.effect in {"loss","all"}:
                                 (loss_A,loss_B) = self.spmatrices_loss()
                             if self.effect in {"diffusion","all"}:
                                 (diff_A,diff_B) = self.spmatrices_diff()  
+                                diff_lu = factorise_diff(diff_A)
+                            Q_loss = (Q.flatten('C')*(self.delta_t/q_scale)).astype(self.dtype,copy=False)
+                            Q_diff = (Q.flatten('F')*(self.delta_t/q_scale)).astype(self.dtype,copy=False)
                         
                         elif self.delta_t < self.smallest_delta_t:
                             if ts_check or rel_diff_check:  
@@ -796,21 +928,38 @@ class os_scheme:
                                 break
                     
             #convergence checks failed - store psi_prev and then update psi
-            psi_prev = psi.copy()
+            #each half-step solves into a fresh rhs buffer, so psi_prev can hold on to the old array without a copy
+            psi_prev = psi
             """ 
             Matrix solutions 
             
             When reshaping arrays, the order can be given as 'C' ('c' or row-major) 
             or 'F' ('fortran' or column-major) styles
+            ravel only copies when psi is not already in the requested order (the two
+            half-steps alternate orders, so with both effects one transpose each is 
+            unavoidable), and the solutions reshape back into (I,J) views
+            A is block diagonal with tridiagonal blocks, so the whole system is itself 
+            tridiagonal and is solved directly from its LAPACK gttrf factorisation
+            (the loss A is upper bidiagonal and only needs a back-substitution)
             """
             if self.effect in {"loss","all"}: 
-                rhs = loss_B.dot(psi.flatten('C')) + (Q.flatten('C')*self.delta_t)
-                psi = sparse.linalg.spsolve(loss_A, rhs)   
+                rhs = tridiag_dot(*loss_B,psi.ravel('C'))
+                rhs += Q_loss
+                (psi,info) = tbtrs(loss_A,rhs,overwrite_b=True)
+                if info != 0:
+                    warning(f"OS energy-loss solve failed at iteration {t} (LAPACK tbtrs info = {info}), stopping and returning psi from the previous iteration")
+                    psi = psi_prev
+                    break
                 psi = np.reshape(psi, (I,J), order='C')
                 
             if self.effect in {"diffusion","all"}: 
-                rhs = diff_B.dot(psi.flatten('F')) + (Q.flatten('F')*self.delta_t)
-                psi = sparse.linalg.spsolve(diff_A, rhs)                   
+                rhs = tridiag_dot(*diff_B,psi.ravel('F'))
+                rhs += Q_diff
+                (psi,info) = gttrs(*diff_lu,rhs,overwrite_b=True)
+                if info != 0:
+                    warning(f"OS diffusion solve failed at iteration {t} (LAPACK gttrs info = {info}), stopping and returning psi from the previous iteration")
+                    psi = psi_prev
+                    break
                 psi = np.reshape(psi, (I,J), order='F')
                 
             """ Implement boundary condition and update counters """             
@@ -822,15 +971,22 @@ class os_scheme:
             progress(t,max_t,prefix="OS Progess:")
             """ Store solution for animation """
             if self.animation_flag is True:
-                snapshot = (psi.copy()[:-1],self.delta_t)
-                self.snapshots.append(snapshot)
+                np.multiply(psi[:-1],q_scale,out=snap_psi[t])
+                snap_dt[t] = self.delta_t
 
             """ Debugging breakpoints """
             # if t%1000 == 0:
             #     print(f"debugging - iteration {t}")
         
         #end while loop
+        if self.animation_flag is True:
+            self.snapshots = (snap_psi[:t+1],snap_dt[:t+1])
         print()
+        if not convergence_check:
+            #relative change over the last step, taken before rescaling so psi and psi_prev are in the same units
+            np.subtract(psi[:-1],psi_prev[:-1],out=dpsi)
+            update_rel_diff()
+        psi = psi.astype(np.float64)*q_scale    #back to double precision and physical units
         self.electrons = psi.copy()        #final equilibrium solution
 
         print("OS loop completed.")